@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+"""
+Batch simulator: many 'connect k' games with gravity played in lockstep, as
+numpy arrays, to run random or policy-driven playouts by thousands.
+"""
+
+import sys
+
+import numpy as np
+
+
+def aligned(tokens, k):
+    """
+    Return, for each board of a (N, X, Y) boolean array, whether it has k
+    tokens in a row: the k shifted windows of each direction are and-ed.
+    """
+    N, X, Y = tokens.shape
+    found = np.zeros(N, dtype=bool)
+    for dx, dy in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+        width, height = X - (k-1)*dx, Y - (k-1)*abs(dy)
+        if width <= 0 or height <= 0:
+            continue
+        window = np.ones((N, width, height), dtype=bool)
+        for i in xrange(k):
+            x = i*dx
+            y = i*dy if dy >= 0 else (k-1-i)
+            window &= tokens[:, x:x+width, y:y+height]
+        found |= window.reshape(N, -1).any(axis=1)
+    return found
+
+
+def open_line_counts(boards, k):
+    """
+    Return a (N, 3, k+1) array whose [i, color, n] item is the number of
+    lines of k cells of the board i holding n tokens of the color and none
+    of the other one (see Connect.Game.open_lines).
+    """
+    N, X, Y = boards.shape
+    windows = [None, [], []]
+    for color in [1, 2]:
+        tokens = (boards == color).astype(np.int32)
+        for dx, dy in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+            width, height = X - (k-1)*dx, Y - (k-1)*abs(dy)
+            if width <= 0 or height <= 0:
+                continue
+            total = np.zeros((N, width, height), dtype=np.int32)
+            for i in xrange(k):
+                x = i*dx
+                y = i*dy if dy >= 0 else (k-1-i)
+                total += tokens[:, x:x+width, y:y+height]
+            windows[color].append(total.reshape(N, -1))
+    counts = np.zeros((N, 3, k+1), dtype=np.int64)
+    for color in [1, 2]:
+        mine = np.concatenate(windows[color], axis=1)
+        theirs = np.concatenate(windows[color % 2 + 1], axis=1)
+        for n in xrange(k+1):
+            counts[:, color, n] = ((mine == n) & (theirs == 0)).sum(axis=1)
+    return counts
+
+
+
+class Games (object):
+    """
+    N games of 'connect k' with gravity on X*Y boards, stored as a (N, X, Y)
+    array of colors and a (N, X) array of column heights. A move is one
+    column per game; finished games ignore theirs.
+    Statuses are the ones of Generic.Game.play: -1 open, 0 draw, else the
+    winner.
+    """
+
+    def __init__(self, count, columns=5, rows=5, k=4):
+        self.N = count
+        self.X = columns
+        self.Y = rows
+        self.K = k
+        self.boards = np.zeros((count, columns, rows), dtype=np.int8)
+        self.heights = np.zeros((count, columns), dtype=np.int32)
+        self.colors = np.ones(count, dtype=np.int8)      # The color whose turn it is
+        self.status = -np.ones(count, dtype=np.int8)
+        self.plies = np.zeros(count, dtype=np.int32)
+
+
+    @classmethod
+    def load(cls, game, count):
+        """Return 'count' copies of a Connect.Game (with gravity)."""
+        if not game.gravity:
+            raise RuntimeError("Only games with gravity can be batched.")
+        games = cls(count, game.X, game.Y, game.K)
+        board = np.array([[game._cell(x, y) for y in xrange(game.Y)]
+                          for x in xrange(game.X)], dtype=np.int8)
+        games.boards[:] = board
+        games.heights[:] = game._rows
+        games.colors[:] = game.currentColor
+        games.status[:] = game.status
+        games.plies[:] = len(game.history)
+        return games
+
+
+    def legal(self):
+        """Return a (N, X) boolean array of the columns each game can play."""
+        return (self.heights < self.Y) & (self.status == -1)[:, None]
+
+
+    def play(self, columns):
+        """Play a column in each open game and return the new statuses."""
+        games = np.flatnonzero(self.status == -1)
+        if len(games) == 0:
+            return self.status
+        columns = np.asarray(columns)[games]
+        rows = self.heights[games, columns]
+        if (rows >= self.Y).any():
+            raise RuntimeError("This column is full.")
+        colors = self.colors[games]
+        self.boards[games, columns, rows] = colors
+        self.heights[games, columns] += 1
+        self.plies[games] += 1
+        self.colors[games] = 3 - colors
+        # Only the player who just moved can have won
+        won = aligned(self.boards[games] == colors[:, None, None], self.K)
+        self.status[games[won]] = colors[won]
+        full = ~won & (self.plies[games] == self.X * self.Y)
+        self.status[games[full]] = 0
+        return self.status
+
+
+    def features(self, color):
+        """
+        Return (features, outcomes) of the games for a color, as
+        CrossFour.feature_matrix does for CrossFour games.
+        """
+        counts = open_line_counts(self.boards, self.K)
+        features = np.zeros((self.N, 6), dtype=np.int64)
+        draw = self.status == 0
+        features[draw, 0] = self.plies[draw]
+        features[draw, 1] = 1
+        running = self.status == -1
+        other = 3 - color
+        features[running, 2] = counts[running, color, self.K-2] + counts[running, color, self.K-1]
+        features[running, 3] = counts[running, other, self.K-2] + counts[running, other, self.K-1]
+        features[running, 4] = self.plies[running]
+        features[running, 5] = 1
+        outcomes = np.zeros(self.N, dtype=np.int64)
+        outcomes[self.status == color] = sys.maxint - self.plies[self.status == color]
+        outcomes[self.status == other] = -sys.maxint + self.plies[self.status == other]
+        return features, outcomes
+
+
+    def random_moves(self, rand=np.random):
+        """Return a legal column per game, picked uniformly."""
+        return (rand.random_sample((self.N, self.X)) * self.legal()).argmax(axis=1)
+
+
+    def playout(self, policy=None, rand=np.random):
+        """
+        Play all the games to their end and return their statuses.
+        At each ply, policy(games) returns the columns to play; by default,
+        they are picked at random with 'rand' (a numpy RandomState).
+        """
+        while (self.status == -1).any():
+            if policy is None:
+                self.play(self.random_moves(rand))
+            else:
+                self.play(policy(self))
+        return self.status
+
+
+
+def random_playouts(game, count, seed=None):
+    """
+    Play 'count' random games from a Connect.Game (with gravity) and return
+    the number of (draws, wins of player 1, wins of player 2).
+    """
+    status = Games.load(game, count).playout(rand=np.random.RandomState(seed))
+    return tuple(np.bincount(status, minlength=3))
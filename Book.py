@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""
+Opening books: the moves to play in the first plies of CrossFour games, so
+that players do not search them again and again. A book is found by deep
+searches or by aggregating the results of self-play games, and saved as a
+Database.Database of records which only have a move.
+"""
+
+import random
+
+import CrossFour
+import Database
+import Tablebase
+
+
+def search_book(game, plies, player, engine='minimax', table=None):
+    """
+    Return the records of the best moves found by the player for all the
+    positions (up to symmetry) within 'plies' plies of the game. The table,
+    if any, is cleared as Database.opening_records does.
+    """
+    return Database.opening_records(game, plies, player, engine, table)
+
+
+def selfplay_games(player1, player2, count, columns=8, rows=8, random_plies=4, seed=None):
+    """
+    Have two players play 'count' games, player1 starting, and return them as
+    a list of (columns played, status). The first 'random_plies' plies are
+    played at random, so that games differ.
+    """
+    rand = random.Random(seed)
+    games = []
+    for i in xrange(count):
+        game = CrossFour.Game(columns, rows)
+        player1.color, player2.color = 1, 2
+        while game.status == -1:
+            if len(game.history) < random_plies:
+                game.play(rand.choice(game.possible_moves()))
+            else:
+                [player1, player2][len(game.history) % 2].play(game)
+        games.append(([move.column for move in game.history], game.status))
+    return games
+
+
+def selfplay_book(games, columns=8, rows=8, plies=8, min_games=2):
+    """
+    Return the records of the moves which scored best (1 for a win, 0.5 for a
+    draw) in the first 'plies' plies of games (as returned by selfplay_games),
+    among the moves played at least 'min_games' times in their position.
+    """
+    # Score and number of games by canonical position and move
+    stats = {}
+    for moves, status in games:
+        game = CrossFour.Game(columns, rows)
+        for column in moves[:plies]:
+            key, symmetry = game.canonical()
+            move = game.transform_move(game.move(column), symmetry)
+            score = 0.5 if status == 0 else float(status == game.currentColor)
+            total = stats.setdefault(key, {}).setdefault(Tablebase._code(game, move), [0., 0])
+            total[0] += score
+            total[1] += 1
+            game.play(column)
+    records = {}
+    for key, moves in stats.iteritems():
+        played = [(score / count, count, code) for code, (score, count) in moves.iteritems()
+                  if count >= min_games]
+        if played:
+            records[key] = Database.UNKNOWN*256 + max(played)[2]
+    return records
+
+
+def save(game, filename, records):
+    """Save a book for the geometry of the game and return its number of positions."""
+    return Database.build(game, filename, records)
+
+
+
+class Book (Database.Database):
+    """A book saved by save(), memory mapped."""
+
+    def move(self, game):
+        """Return the book move of the position of the game, None if not in the book."""
+        record = self.lookup(game)
+        return None if record is None else record[1]
@@ -0,0 +1,565 @@
+#!/usr/bin/env python
+
+"""
+Implements a generic 'connect k' game simulator: CrossFour, CrossThree and
+TicTacToe are just configurations of it.
+"""
+
+
+import Generic
+import numpy as np
+
+
+_line_tables = {}
+
+def winning_lines(columns, rows, k):
+    """
+    Return (lines, cell_lines) where 'lines' is the list of all the lines of k
+    cells of the board (a cell (x, y) being indexed by x*rows+y) and
+    'cell_lines' gives, for each cell, the indexes of the lines going through it.
+    Tables are computed once per board geometry.
+    """
+    if (columns, rows, k) not in _line_tables:
+        lines = []
+        cell_lines = [[] for cell in xrange(columns*rows)]
+        for dx, dy in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+            for x in xrange(columns):
+                for y in xrange(rows):
+                    if not (0 <= x + (k-1)*dx < columns and 0 <= y + (k-1)*dy < rows):
+                        continue
+                    line = [(x + i*dx)*rows + y + i*dy for i in xrange(k)]
+                    for cell in line:
+                        cell_lines[cell].append(len(lines))
+                    lines.append(line)
+        _line_tables[(columns, rows, k)] = (lines, cell_lines)
+    return _line_tables[(columns, rows, k)]
+
+
+def open_line_counts(board, k):
+    """
+    Return [None, counts of color 1, counts of color 2] where counts[n] is
+    the number of lines of k cells of a (X, Y) board holding n tokens of the
+    color and none of the other one, computed from scratch with numpy: the
+    tokens of each window are summed from k shifted slices of the board.
+    """
+    board = np.asarray(board)
+    X, Y = board.shape
+    windows = [[], [], []]
+    for color in [1, 2]:
+        tokens = (board == color).astype(np.int32)
+        for dx, dy in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+            width, height = X - (k-1)*dx, Y - (k-1)*abs(dy)
+            if width <= 0 or height <= 0:
+                continue
+            total = np.zeros((width, height), dtype=np.int32)
+            for i in xrange(k):
+                x = i*dx
+                y = i*dy if dy >= 0 else (k-1-i)
+                total += tokens[x:x+width, y:y+height]
+            windows[color].append(total.ravel())
+    counts = [None]
+    for color in [1, 2]:
+        mine = np.concatenate(windows[color])
+        theirs = np.concatenate(windows[color % 2 + 1])
+        counts.append(list(np.bincount(mine[theirs == 0], minlength=k+1)))
+    return counts
+
+
+def aligned(bits, k, shifts):
+    """
+    Return True if a bitboard has k bits aligned along one of the shifts
+    (the distances between two neighbouring cells in each direction): the
+    bits starting a run of 2 are found by a shift-and-AND, then those
+    starting a run of 4, 8... and finally of k.
+    """
+    for shift in shifts:
+        m = bits & (bits >> shift)
+        run = 2
+        while 2*run <= k:
+            m &= m >> (run*shift)
+            run *= 2
+        if run < k:
+            m &= m >> ((k-run)*shift)
+        if m:
+            return True
+    return False
+
+
+_move_tables = {}
+
+def move_tables(columns, rows, gravity):
+    """
+    Return (moves, order): the moves of the board interned by color, as
+    moves[color][index] with index a column (with gravity) or a cell x*rows+y
+    (without), and the indexes from the center of the board outward.
+    Moves are never modified once played, so games share the same instances
+    instead of allocating new ones at each node. Tables are computed once per
+    board geometry.
+    """
+    if (columns, rows, gravity) not in _move_tables:
+        if gravity:
+            moves = [None] + [[Move(x, color) for x in xrange(columns)] for color in [1, 2]]
+            order = sorted(xrange(columns), key=lambda x: abs(2*x - columns + 1))
+        else:
+            moves = [None] + [[PositionMove((cell // rows, cell % rows), color)
+                               for cell in xrange(columns*rows)]
+                              for color in [1, 2]]
+            order = sorted(xrange(columns*rows),
+                           key=lambda cell: abs(2*(cell // rows) - columns + 1) +
+                                            abs(2*(cell % rows) - rows + 1))
+        _move_tables[(columns, rows, gravity)] = (moves, order)
+    return _move_tables[(columns, rows, gravity)]
+
+
+_symmetry_tables = {}
+
+def symmetries(columns, rows, gravity):
+    """
+    Return (permutations, inverses): the symmetries of the board as
+    permutations of its cells (permutation[cell] being the image of the cell)
+    and their inverses, the identity first. With gravity, a board can only be
+    mirrored; without, it has the symmetries of a square (8) or of a
+    rectangle (4). Tables are computed once per board geometry.
+    """
+    if (columns, rows, gravity) not in _symmetry_tables:
+        X, Y = columns, rows
+        images = [lambda x, y: (x, y),
+                  lambda x, y: (X-1-x, y)]
+        if not gravity:
+            images += [lambda x, y: (x, Y-1-y),
+                       lambda x, y: (X-1-x, Y-1-y)]
+            if X == Y:
+                images += [lambda x, y: (y, x),
+                           lambda x, y: (X-1-y, X-1-x),
+                           lambda x, y: (y, X-1-x),
+                           lambda x, y: (X-1-y, x)]
+        permutations, inverses = [], []
+        for image in images:
+            permutation = [0]*(X*Y)
+            inverse = [0]*(X*Y)
+            for x in xrange(X):
+                for y in xrange(Y):
+                    ix, iy = image(x, y)
+                    permutation[x*Y + y] = ix*Y + iy
+                    inverse[ix*Y + iy] = x*Y + y
+            permutations.append(permutation)
+            inverses.append(inverse)
+        _symmetry_tables[(columns, rows, gravity)] = (permutations, inverses)
+    return _symmetry_tables[(columns, rows, gravity)]
+
+
+
+class Game (Generic.Game):
+    """
+    A 'connect k' game: players alternately put a token on a X*Y board and
+    the first one to align k tokens wins.
+    With gravity, tokens fall to the bottom of their column and moves are
+    columns. Without it, any empty cell can be played and moves are (x, y).
+    The Zobrist hash of the board seen through each of its symmetries is
+    kept up to date, so that symmetric positions share a canonical hash.
+    So is open_lines[color][n]: the number of lines holding n tokens of the
+    color and none of the other one (open twos, threes...), for evaluations.
+
+    The board is a numpy array, whose wins are found by the token counters
+    of the lines through the last move. With 'bitboard', each color is a
+    python int instead, cell (x, y) being bit x*(Y+1)+y: the sentinel bit on
+    top of each column is always empty, so that shifting a bitboard never
+    aligns the top of a column with the bottom of the next one. Wins are then
+    found by shift-and-AND on the bitboard of the mover, and the line
+    counters (thus open_lines) are only kept up to date with 'track_lines':
+    else open_lines is None and evaluations compute it from scratch.
+    """
+
+    def __init__(self, columns, rows, k, gravity=True, bitboard=False, track_lines=True):
+        Generic.Game.__init__(self)
+        self.X = columns
+        self.Y = rows
+        self.K = k
+        self.gravity = gravity
+        self.bitboard = bitboard
+        self.track_lines = track_lines
+        if bitboard:
+            self._bits = [None, 0, 0]  # The bitboard of each color
+            # Shifts between neighbours: vertical, horizontal and diagonals
+            self._shifts = [1, self.Y + 1, self.Y + 2, self.Y]
+        elif not track_lines:
+            raise RuntimeError("The numpy board finds wins with the line counters.")
+        else:
+            self._board = np.zeros(self.X*self.Y).reshape(self.X, self.Y)
+        self._rows = [0]*self.X
+        self._zobrist = Generic.zobrist_keys(self.X*self.Y)
+        self._symmetries, self._inverses = symmetries(self.X, self.Y, self.gravity)
+        self._moves, self._order = move_tables(self.X, self.Y, self.gravity)
+        self._hashes = [0]*len(self._symmetries)  # The hash by symmetry
+        self._lines, self._cell_lines = winning_lines(self.X, self.Y, self.K)
+        # Number of tokens of each color on each line
+        self._counts = [None, [0]*len(self._lines), [0]*len(self._lines)]
+        self.open_lines = None
+        if track_lines:
+            self.open_lines = [None,
+                               [len(self._lines)] + [0]*self.K,
+                               [len(self._lines)] + [0]*self.K]
+
+
+    def __str__(self):
+        return "<Connect {} game>".format(self.K)
+
+
+    def move(self, index, color=None):
+        """
+        Return the (interned) move of a column, or of an (x, y) position
+        without gravity, for a color (the current one by default).
+        """
+        if color is None:
+            color = self.currentColor
+        if not self.gravity:
+            x, y = index
+            if not (0 <= x < self.X and 0 <= y < self.Y):
+                raise RuntimeError("This position is out of the board.")
+            index = x*self.Y + y
+        elif not 0 <= index < self.X:
+            raise RuntimeError("This column is out of the board.")
+        return self._moves[color][index]
+
+
+    def play(self, move):
+        """
+        Play a move and return the new status of the game:
+         -1: open
+          0: draw
+          1: player 1 won
+          2: player 2 won
+        """
+        if self.status != -1:
+            raise RuntimeError("This game is finished.")
+        # Ensure that this is an acceptable move
+        if type(move) is int or type(move) is tuple:
+            move = self.move(move)
+        elif move.color is None:
+            move.color = self.currentColor
+        elif move.color != self.currentColor:
+            raise RuntimeError("Color {} cannot play this turn.".format(move.color))
+        if self.gravity:
+            x = move.column
+            y = self._rows[x]
+            if y >= self.Y:
+                raise RuntimeError("This column is full.")
+            self._rows[x] += 1
+        else:
+            x, y = move.position
+            if self._cell(x, y) != 0:
+                raise RuntimeError("This position is already occupied.")
+        # Play the move
+        cell = x*self.Y + y
+        self._update_hashes(cell, move.color)
+        self.history.append(move)
+        self.currentColor = self.currentColor % 2 + 1
+        if self.bitboard:
+            bits = self._bits[move.color] | 1 << (x*(self.Y+1) + y)
+            self._bits[move.color] = bits
+            if self.track_lines:
+                self._add_token(cell, move.color)
+            won = aligned(bits, self.K, self._shifts)
+        else:
+            self._board.itemset((x, y), move.color)
+            won = self._add_token(cell, move.color)
+        if won:
+            self.status = move.color
+        elif len(self.history) == self.X * self.Y:
+            self.status = 0
+        return self.status
+
+
+    def _add_token(self, cell, color):
+        """
+        Count a token of a color in the lines going through a cell, and
+        return True if it completes one of them.
+        """
+        won = False
+        other = color % 2 + 1
+        counts, others = self._counts[color], self._counts[other]
+        mine, theirs = self.open_lines[color], self.open_lines[other]
+        for line in self._cell_lines[cell]:
+            n = counts[line]
+            if others[line] == 0:
+                # Still open for the color, and no longer for the other one if empty
+                mine[n] -= 1
+                mine[n+1] += 1
+                if n == 0:
+                    theirs[0] -= 1
+            elif n == 0:
+                # No longer open for the other color
+                theirs[others[line]] -= 1
+            counts[line] = n + 1
+            if n + 1 == self.K:
+                won = True
+        return won
+
+
+    def revert(self):
+        """Revert the last move played."""
+        if len(self.history) == 0:
+            raise RuntimeError("No more move to revert!")
+        move = self.history.pop()
+        if self.gravity:
+            x = move.column
+            self._rows[x] -= 1
+            y = self._rows[x]
+        else:
+            x, y = move.position
+        cell = x*self.Y + y
+        if self.bitboard:
+            self._bits[move.color] &= ~(1 << (x*(self.Y+1) + y))
+        else:
+            self._board.itemset((x, y), 0)
+        self._update_hashes(cell, move.color)
+        if self.track_lines:
+            self._remove_token(cell, move.color)
+        self.currentColor = self.currentColor % 2 + 1
+        self.status = -1
+
+
+    def _remove_token(self, cell, color):
+        """Uncount a token of a color in the lines going through a cell."""
+        other = color % 2 + 1
+        counts, others = self._counts[color], self._counts[other]
+        mine, theirs = self.open_lines[color], self.open_lines[other]
+        for line in self._cell_lines[cell]:
+            n = counts[line] - 1
+            if others[line] == 0:
+                mine[n+1] -= 1
+                mine[n] += 1
+                if n == 0:
+                    theirs[0] += 1
+            elif n == 0:
+                theirs[others[line]] += 1
+            counts[line] = n
+
+
+    def _cell(self, x, y):
+        """Return the color of the token at (x, y), 0 if empty."""
+        if self.bitboard:
+            bit = x*(self.Y+1) + y
+            if self._bits[1] >> bit & 1:
+                return 1
+            return 2 if self._bits[2] >> bit & 1 else 0
+        return int(self._board.item(x, y))
+
+
+    def _update_hashes(self, cell, color):
+        """Toggle a token in the hashes of all the symmetries."""
+        hashes = self._hashes
+        for i, permutation in enumerate(self._symmetries):
+            hashes[i] ^= self._zobrist[permutation[cell]][color]
+        self.hash = hashes[0]
+
+
+    def canonical(self):
+        """
+        Return (hash, symmetry): the smallest hash of the symmetric positions
+        and the index of the symmetry giving it.
+        """
+        key = min(self._hashes)
+        return key, self._hashes.index(key)
+
+
+    def transform_move(self, move, symmetry, inverse=False):
+        """Return the image of a move by a symmetry (or by its inverse)."""
+        if symmetry == 0:
+            return move
+        if self.gravity:
+            # The only symmetry is the mirror
+            index = self.X - 1 - move.column
+        else:
+            x, y = move.position
+            permutation = self._inverses[symmetry] if inverse else self._symmetries[symmetry]
+            index = permutation[x*self.Y + y]
+        if move.color is None:
+            return Move(index) if self.gravity else PositionMove((index // self.Y, index % self.Y))
+        return self._moves[move.color][index]
+
+
+    def unique_moves(self, moves):
+        """
+        Return the moves, without those leading to the same position as an
+        earlier one up to a symmetry leaving the current position unchanged.
+        """
+        fixed = [i for i, key in enumerate(self._hashes) if key == self.hash][1:]
+        if not fixed:
+            return moves
+        unique = []
+        twins = set()
+        for move in moves:
+            if move in twins:
+                continue
+            unique.append(move)
+            for i in fixed:
+                twins.add(self.transform_move(move, i))
+        return unique
+
+
+    def possible_moves(self):
+        """Return all the possible moves for this turn."""
+        if self.status != -1:
+            return []
+        moves = self._moves[self.currentColor]
+        if self.gravity:
+            return [moves[x] for x in xrange(self.X) if self._rows[x] < self.Y]
+        return [moves[x*self.Y + y]
+                for x in xrange(self.X)
+                for y in xrange(self.Y)
+                if self._cell(x, y) == 0]
+
+
+    def iter_moves(self):
+        """Generate the possible moves for this turn, from the center outward."""
+        if self.status != -1:
+            return
+        moves = self._moves[self.currentColor]
+        for index in self._order:
+            if self.gravity:
+                if self._rows[index] < self.Y:
+                    yield moves[index]
+            elif self._cell(index // self.Y, index % self.Y) == 0:
+                yield moves[index]
+
+
+    def is_legal(self, move):
+        """Return whether a move can be played this turn."""
+        if self.status != -1 or move.color != self.currentColor:
+            return False
+        if self.gravity:
+            return isinstance(move, Move) and 0 <= move.column < self.X and \
+                self._rows[move.column] < self.Y
+        if not isinstance(move, PositionMove):
+            return False
+        x, y = move.position
+        return 0 <= x < self.X and 0 <= y < self.Y and self._cell(x, y) == 0
+
+
+    def moves_left(self):
+        """Return the number of moves left before the board is full."""
+        return self.X * self.Y - len(self.history)
+
+
+    def to_string(self):
+        """Return a string with a 'graphical' display of the board."""
+        if self.gravity:
+            out = " " + "".join([str(i) for i in range(self.X)]) + "\n"
+            for y in xrange(self.Y-1, -1, -1):
+                out += "|" + self._row_to_string(y) + "|\n"
+            out += "-"*self.X + "--\n"
+            out += " " + "".join([str(i) for i in range(self.X)]) + "\n"
+        else:
+            out = "  " + "".join([str(i) for i in range(self.X)]) + "-> X\n"
+            out += " /" + "-"*self.X + "\\\n"
+            for y in xrange(self.Y):
+                out += "{}|".format(y) + self._row_to_string(y) + "|\n"
+            out += "|\\" + "-"*self.X + "/\n"
+            out += "V\nY\n"
+        if self.status != -1:
+            out += "Status: " + str(self.status) + "\n"
+        return out
+
+
+    def _row_to_string(self, y):
+        out = ""
+        for x in xrange(self.X):
+            v = self._cell(x, y)
+            if v == 0:
+                out += " "
+            else:
+                out += str(v)
+        return out
+
+
+    def compute_open_lines(self):
+        """Return open_lines computed from scratch, looking at the board only."""
+        board = [[self._cell(x, y) for y in xrange(self.Y)] for x in xrange(self.X)]
+        return open_line_counts(board, self.K)
+
+
+    def _compute_status(self):
+        """
+        Compute the status of the game from scratch, looking at the board only.
+        """
+        winner = 0
+        if self.bitboard:
+            for color in [1, 2]:
+                if aligned(self._bits[color], self.K, self._shifts):
+                    winner = color
+                    break
+        else:
+            b = self._board.reshape(self.X*self.Y)
+            for line in self._lines:
+                color = b.item(line[0])
+                if color != 0 and all([b.item(cell) == color for cell in line[1:]]):
+                    winner = int(color)
+                    break
+        if winner:
+            self.status = winner
+        elif len(self.history) == self.X * self.Y:
+            self.status = 0
+        else:
+            self.status = -1
+        return self.status
+
+
+
+class Move (Generic.Move):
+    """
+    A move of a game with gravity: the column where the token is dropped.
+    """
+
+    __slots__ = ('column',)
+
+    def __init__(self, column, color=None):
+        """Create a move."""
+        Generic.Move.__init__(self, color)
+        self.column = column
+
+    def __str__(self):
+        return "<{}:{}>".format(self.color, str(self.column))
+
+    def __eq__(self, other):
+        return isinstance(other, Move) and \
+            self.column == other.column and self.color == other.color
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.column, self.color))
+
+    def __reduce__(self):
+        return Move, (self.column, self.color)
+
+
+
+class PositionMove (Generic.Move):
+    """
+    A move of a game without gravity: the (x, y) position of the token.
+    """
+
+    __slots__ = ('position',)
+
+    def __init__(self, position, color=None):
+        """Create a move."""
+        Generic.Move.__init__(self, color)
+        self.position = position
+
+    def __str__(self):
+        return "<{}:{}>".format(self.color, str(self.position))
+
+    def __eq__(self, other):
+        return isinstance(other, PositionMove) and \
+            self.position == other.position and self.color == other.color
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.position, self.color))
+
+    def __reduce__(self):
+        return PositionMove, (self.position, self.color)
@@ -7,146 +7,97 @@ Implements a Cross Four game simulator.
 
 
 import Generic
+import Connect
 from Minimax import minimax
-import numpy as np
 import random
 import sys
+import numpy as np
 
 
-class Game (Generic.Game):
+class Game (Connect.Game):
     """
-    The Cross Four game.
+    The Cross Four game: four tokens to align, with gravity.
+    The board is a numpy array, or bitboards if 'bitboard' is set (see
+    Connect.Game, also for 'track_lines').
     """
 
-    def __init__(self, columns=5, rows=5):
-        Generic.Game.__init__(self)
-        self.X = columns
-        self.Y = rows
-        self._board = np.zeros(self.X*self.Y).reshape(self.X, self.Y)
-        self._rows = [0]*self.X
+    def __init__(self, columns=5, rows=5, bitboard=False, track_lines=True):
+        Connect.Game.__init__(self, columns, rows, 4, gravity=True,
+                              bitboard=bitboard, track_lines=track_lines)
 
 
     def __str__(self):
         return "<CrossFour game>"
 
 
-    def play(self, move):
-        """
-        Play a move.
-        If the game is finished, return the end result in {'white', 'black', 'draw'}.
-        None is return if the game is still open.
-        """
-        if self.status != -1:
-            raise RuntimeError("This game is finished.")
-        # Ensure that this is an acceptable move
-        if type(move) is int:
-            move = Move(move)
-        if move.color is None:
-            move.color = self.currentColor
-        elif move.color != self.currentColor:
-            raise RuntimeError("Color {} cannot play this turn.".format(move.color))
-        if self._rows[move.column] >= self.Y:
-            raise RuntimeError("This column is full.")
-        # Play the move
-        self._board.itemset((move.column, self._rows[move.column]), move.color)
-        self._rows[move.column] += 1
-        self.history.append(move)
-        self.currentColor = self.currentColor % 2 + 1
-        # Status has to be recomputed
-        return self._compute_status()
-
-
-    def revert(self):
-        """Revert the last move played."""
-        if len(self.history) == 0:
-            raise RuntimeError("No more move to revert!")
-        move = self.history.pop()
-        self._rows[move.column] -= 1
-        self._board.itemset((move.column, self._rows[move.column]), 0)
-        self.currentColor = self.currentColor % 2 + 1
-        self.status = -1
-
-    def possible_moves(self):
-        """Return all the possible moves for this turn."""
-        if self.status != -1:
-            return []
-        return [Move(x, self.currentColor)
-                for x in range(self.X)
-                if self._rows[x] < self.Y]
-
-    def to_string(self):
-        """Return a string with a 'graphical' display of the board."""
-        out = " " + "".join([str(i) for i in range(self.X)]) + "\n"
-        for y in xrange(self.Y-1, -1, -1):
-            out += "|"
-            for x in xrange(self.X):
-                v = self._board[x,y]
-                if v == 0:
-                    out += " "
-                else:
-                    out += str(int(v))
-            out += "|\n"
-        out += "-"*self.X + "--\n"
-        out += " " + "".join([str(i) for i in range(self.X)]) + "\n"
-        if self.status != -1:
-            out += "Status: " + str(self.status) + "\n"
-        return out
-
-
-    def _compute_status(self):
-        """Return the winner of the game."""
-        # Look for a winner: three tokens with same color aligned
-        b = self._board
-        for color in [1, 2]:
-            for y in range(self.Y - 3):
-                for x in xrange(self.X - 3):
-                    if (b.item(x,y) == color and b.item(x+1,y) == color and b.item(x+2,y) == color and b.item(x+3,y) == color) or \
-                       (b.item(x,y) == color and b.item(x,y+1) == color and b.item(x,y+2) == color and b.item(x,y+3) == color) or \
-                       (b.item(x,y) == color and b.item(x+1,y+1) == color and b.item(x+2,y+2) == color and b.item(x+3,y+3) == color) or \
-                       (b.item(x+3,y) == color and b.item(x+2,y+1) == color and b.item(x+1,y+2) == color and b.item(x,y+3) == color):
-                        self.status = color
-                        return color
-            for y in range(self.Y - 3):
-                if (b.item(self.X-1,y) == color and b.item(self.X-1,y+1) == color and b.item(self.X-1,y+2) == color and b.item(self.X-1,y+3) == color) or \
-                   (b.item(self.X-2,y) == color and b.item(self.X-2,y+1) == color and b.item(self.X-2,y+2) == color and b.item(self.X-2,y+3) == color) or \
-                   (b.item(self.X-3,y) == color and b.item(self.X-3,y+1) == color and b.item(self.X-3,y+2) == color and b.item(self.X-3,y+3) == color):
-                    self.status = color
-                    return color
-            for x in range(self.X - 3):
-                if (b.item(x,self.Y-1) == color and b.item(x+1,self.Y-1) == color and b.item(x+2,self.Y-1) == color and b.item(x+3,self.Y-1) == color) or \
-                   (b.item(x,self.X-2) == color and b.item(x+1,self.X-2) == color and b.item(x+2,self.X-2) == color and b.item(x+3,self.X-2) == color) or \
-                   (b.item(x,self.X-3) == color and b.item(x+1,self.X-3) == color and b.item(x+2,self.X-3) == color and b.item(x+3,self.X-3) == color):
-                    self.status = color
-                    return color
-        # Check if the game is complete
-        if len(self.history) == self.X * self.Y:
-            self.status = 0
-            return self.status
-        # Well, then the game is still open...
-        self.status = -1
-        return self.status
-
-
-
-class Move (Generic.Move):
+
+# A move is the column where the token is dropped
+Move = Connect.Move
+
+
+
+def features(game, color):
+    """
+    Return the features of the position of a game for a color, so that the
+    evaluation of an AdvancedPlayer of this color is the dot product of its
+    genome with them, unless the game is won:
+     - draw: [strokes, 1, 0, 0, 0, 0],
+     - open: [0, 0, open twos and threes of the color, those of the other
+       one, strokes, 1],
+     - won: zeros (see outcome).
+    """
+    strokes = len(game.history)
+    if game.status == 0:
+        return [strokes, 1, 0, 0, 0, 0]
+    if game.status != -1:
+        return [0]*6
+    open_lines = game.open_lines or game.compute_open_lines()
+    mine = open_lines[color]
+    theirs = open_lines[color % 2 + 1]
+    return [0, 0,
+            mine[game.K-2] + mine[game.K-1],
+            theirs[game.K-2] + theirs[game.K-1],
+            strokes, 1]
+
+
+def outcome(game, color):
+    """Return the value of a won game for a color (as AdvancedPlayer.eval), 0 otherwise."""
+    if game.status == color:
+        return sys.maxint - len(game.history)
+    if game.status == color % 2 + 1:
+        return -sys.maxint + len(game.history)
+    return 0
+
+
+def feature_matrix(games, color):
     """
-    A move of the CrossFour game.
+    Return (features, outcomes) for a list of games: the (games, 6) matrix
+    of their features and the vector of their outcomes, for a color.
     """
+    return (np.array([features(game, color) for game in games], dtype=np.int64).reshape(-1, 6),
+            np.array([outcome(game, color) for game in games], dtype=np.int64))
 
-    def __init__(self, column, color=None):
-        """Create a move."""
-        Generic.Move.__init__(self, color)
-        self.column = column
 
-    def __str__(self):
-        return "<{}:{}>".format(self.color, str(self.column))
+def evaluate_batch(features, outcomes, genomes):
+    """
+    Return the (positions, genomes) matrix of the evaluations of positions
+    (given by feature_matrix or Batch.Games.features) by AdvancedPlayers of
+    each genome: one product of matrices, the won positions being worth
+    their outcome whatever the genome.
+    """
+    scores = np.dot(features, np.asarray(genomes, dtype=np.int64).T)
+    won = outcomes != 0
+    scores[won] = outcomes[won][:, None]
+    return scores
 
 
 
 class Player (Generic.Minimax_Player):
     """
     A CrossFour player based on minimax.
-    This player explore the whole tree. So, it is "slow".
+    This player explore the whole tree. So, it is "slow". Unless max_depth
+    is set (e.g. by iterative deepening), where positions still open are
+    worth 10: less than a win found, more than a loss.
     """
 
     def __init__(self, color=None):
@@ -157,13 +108,17 @@ class Player (Generic.Minimax_Player):
         """
         Evaluate the current state of the game from the point of view of 'player'.
         It only evaluates _final_ states cause 'small' CrossFour are simple enough that we can go
-        through the whole tree.
+        through the whole tree, unless it is cut at max_depth.
         """
-        strokes = len(game.history)
-        status = game.status
-        if status == -1:
-            raise RuntimeError("This evaluation is only for terminal states")
-        elif status == self.color:
+        if game.status == -1:
+            return 10            # Neither won nor lost yet (-1 < v < 11)
+        return self.eval_outcome(game.status, len(game.history))
+
+    def eval_outcome(self, status, strokes):
+        """
+        Evaluate the end of a game from its status and its number of strokes.
+        """
+        if status == self.color:
             return 20 - strokes  # Let's try to win fast  (11 <= v <= 20)
         elif status == 0:
             return strokes       # or to be on par slowly (0 <= v <= 9)
@@ -172,9 +127,9 @@ class Player (Generic.Minimax_Player):
 
     def cutoff(self, game, depth):
         """
-        Decide when to stop descent in tree.
+        Decide when to stop descent in tree: at max_depth, if any.
         """
-        False
+        return self.max_depth is not None and depth >= self.max_depth
 
 
 class AdvancedPlayer (Player):
@@ -190,7 +145,9 @@ class AdvancedPlayer (Player):
             self.genome = [random.randint(0, 99) for i in range(self.len_genome)]
         elif len(genome) != self.len_genome:
             raise RuntimeError("Wrong genome lenght")
+        else:
             self.genome = genome
+        self.max_depth = 3
 
     def __str__(self):
         return "<ACrossFour Player: " + repr(self.genome) + ">"
@@ -215,8 +172,26 @@ class AdvancedPlayer (Player):
         """
         strokes = len(game.history)
         status = game.status
-        board = game._board
 
+        # Final state
+        if status != -1:
+            return self.eval_outcome(status, strokes)
+
+        # Non final state: open twos and threes (lines with 2 or 3 tokens of
+        # a color and none of the other one), kept up to date by the game
+        # unless it does not track its lines
+        open_lines = game.open_lines or game.compute_open_lines()
+        mine = open_lines[self.color]
+        theirs = open_lines[self.color % 2 + 1]
+        return self.genome[2] * (mine[game.K-2] + mine[game.K-1]) + \
+               self.genome[3] * (theirs[game.K-2] + theirs[game.K-1]) + \
+               self.genome[4] * strokes + \
+               self.genome[5]
+
+    def eval_outcome(self, status, strokes):
+        """
+        Evaluate the end of a game from its status and its number of strokes.
+        """
         # Player win
         if status == self.color:
             #print "e:w({})".format(sys.maxint - strokes)
@@ -228,49 +203,11 @@ class AdvancedPlayer (Player):
             return -sys.maxint + strokes
 
         # Draw
-        elif status == 0:
-            #print "e:d({})".format(self.genome[0] * strokes + self.genome[1])
-            return self.genome[0] * strokes + self.genome[1]
-
-        # Non final state
-        elif status == -1:
-            twoWithSpaceForThreeForPlayer = 0
-            twoWithSpaceForThreeForOpponent = 0
-            for column in range(game.X):
-                row = game._rows[column]
-                if row >= game.Y:
-                    continue
-                if board.item(column, row) == self.color:
-                    for x in [-1, 0, 1]:
-                        for y in [-1, 0, 1]:
-                            if (x, y) == (0, 0) or \
-                               column-x < 0 or game.X <= column+x or \
-                               row-y < 0 or game.Y <= row+y:
-                                continue
-                            if (boad.item(column+y, row+x) == self.color) and \
-                               (boad.item(column-y, row-x) == 0):
-                                twoWithSpaceForThreeForPlayer += 1
-                elif board.item(column, row) == self.color % 2 + 1:
-                    for x in [-1, 0, 1]:
-                        for y in [-1, 0, 1]:
-                            if (x, y) == (0, 0) or \
-                               column-x < 0 or game.X <= column+x or \
-                               row-y < 0 or game.Y <= row+y:
-                                continue
-                            if (boad.item(column+y, row+x) == self.color % 2 + 1) and \
-                               (boad.item(column-y, row-x) == 0):
-                                twoWithSpaceForThreeForOpponent += 1
-            out = self.genome[2] * twoWithSpaceForThreeForPlayer + \
-                  self.genome[3] * twoWithSpaceForThreeForOpponent + \
-                  self.genome[4] * strokes + \
-                  self.genome[5]
-            #print "e:n({})".format(out)
-            return out
-
-
+        #print "e:d({})".format(self.genome[0] * strokes + self.genome[1])
+        return self.genome[0] * strokes + self.genome[1]
 
     def cutoff(self, game, depth):
         """
         Decide when to stop descent in tree.
         """
-        return depth >= 3
+        return depth >= self.max_depth
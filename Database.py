@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""
+Position database for big boards: a sorted array of records (canonical
+hash, value, move) in a memory mapped file, binary searched. Processes
+opening the same file share its pages through the OS page cache.
+
+Records are populated offline:
+ - endgames (near full boards) are solved exactly, their value following
+   Tablebase.WIN,
+ - openings are searched deeply, only their best move being kept (their
+   value is UNKNOWN).
+"""
+
+import random
+import struct
+
+import numpy as np
+
+import Minimax
+import Tablebase
+
+
+MAGIC = 'SKDB'
+HEADER = struct.Struct('<4sBBBBQ')
+RECORD = Tablebase.ENTRY
+
+# The value of the records which only have a move
+UNKNOWN = -128
+
+
+def endgame_records(game, count, empty, seed=None, records=None):
+    """
+    Play 'count' random games from the game until 'empty' cells are left,
+    avoiding the moves which end them, and solve all the positions reachable
+    from there. Return the records as a dict {canonical hash: value*256 +
+    move code} (see Tablebase.solve).
+    """
+    rand = random.Random(seed)
+    if records is None:
+        records = {}
+    start = len(game.history)
+    for i in xrange(count):
+        while game.moves_left() > empty:
+            moves = game.possible_moves()
+            rand.shuffle(moves)
+            for move in moves:
+                if game.play(move) == -1:
+                    break
+                game.revert()
+            else:
+                break
+        if game.moves_left() <= empty:
+            Tablebase.solve(game, records)
+        while len(game.history) > start:
+            game.revert()
+    return records
+
+
+def opening_records(game, plies, player, engine='minimax', table=None, records=None):
+    """
+    Search all the positions (up to symmetry) reachable from the game within
+    'plies' plies with the player's settings and return their best moves as
+    records {canonical hash: UNKNOWN*256 + move code}.
+    The player searches each position for the color to play. As a table must
+    not be shared between colors, 'table' is cleared whenever that color
+    changes: it is then only reused between positions of the same ply.
+    """
+    if records is None:
+        records = {}
+    _opening_records(game, plies, player, engine, table, records, [None])
+    return records
+
+
+def _opening_records(game, plies, player, engine, table, records, searched):
+    """'searched' holds the color of the last search done with the table."""
+    key, symmetry = game.canonical()
+    if key in records or game.status != -1:
+        return
+    if table is not None and searched[0] != game.currentColor:
+        table.clear()
+        searched[0] = game.currentColor
+    color = player.color
+    player.color = game.currentColor
+    value, move, strokes = Minimax.ENGINES[engine](game, player, table=table)
+    player.color = color
+    records[key] = UNKNOWN*256 + Tablebase._code(game, game.transform_move(move, symmetry))
+    if plies > 1:
+        for move in game.unique_moves(game.possible_moves()):
+            game.play(move)
+            _opening_records(game, plies - 1, player, engine, table, records, searched)
+            game.revert()
+
+
+def build(game, filename, records):
+    """
+    Save records (as returned by endgame_records and opening_records) for
+    the geometry of the game in filename and return their number.
+    """
+    entries = np.zeros(len(records), dtype=RECORD)
+    for i, key in enumerate(sorted(records)):
+        packed = records[key]
+        entries[i] = (key, packed >> 8, packed & 255)
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, game.X, game.Y, game.K, game.gravity, len(entries)))
+        entries.tofile(f)
+    return len(entries)
+
+
+
+class Database (object):
+    """
+    A database saved by build(), memory mapped. Pickling it (e.g. to send it
+    to a worker process) only pickles its filename.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            header = f.read(HEADER.size)
+        magic, self.X, self.Y, self.K, gravity, self.size = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise RuntimeError("{} is not a position database.".format(filename))
+        self.gravity = bool(gravity)
+        self._records = np.memmap(filename, dtype=RECORD, mode='r',
+                                  offset=HEADER.size, shape=(self.size,))
+        self._keys = self._records['key']
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        return self.filename
+
+    def __setstate__(self, filename):
+        self.__init__(filename)
+
+    def __len__(self):
+        return self.size
+
+    def lookup(self, game):
+        """
+        Return (value, move) for the position of the game, the value being
+        None if the record only has a move, or None if it is not recorded.
+        """
+        if (game.X, game.Y, game.K, game.gravity) != (self.X, self.Y, self.K, self.gravity):
+            raise RuntimeError("This database is not for this game.")
+        key, symmetry = game.canonical()
+        index = np.searchsorted(self._keys, np.uint64(key))
+        if index == self.size or self._keys[index] != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        record = self._records[index]
+        code = int(record['move'])
+        move = game.move(code if self.gravity else (code // self.Y, code % self.Y))
+        value = int(record['value'])
+        return (None if value == UNKNOWN else value,
+                game.transform_move(move, symmetry, inverse=True))
+
+    def outcome(self, game, value):
+        """
+        Return (status, strokes): the status of the game at its end and its
+        number of strokes then, from the exact value of its position.
+        """
+        if value > 0:
+            return game.currentColor, len(game.history) + Tablebase.WIN - value
+        if value < 0:
+            return game.currentColor % 2 + 1, len(game.history) + Tablebase.WIN + value
+        return 0, len(game.history) + game.moves_left()
@@ -6,7 +6,24 @@ Some generic classes for Game, Move and Player.
 
 
 import random
+import time
 import Minimax
+import Parallel
+
+
+_zobrist_tables = {}
+
+def zobrist_keys(cells):
+    """
+    Return a table of random 64 bits keys indexed by [cell][color].
+    Xoring the keys of all the tokens on a board gives its Zobrist hash.
+    Tables are cached and seeded so that hashes are stable between runs.
+    """
+    if cells not in _zobrist_tables:
+        rand = random.Random(cells)
+        _zobrist_tables[cells] = [[0, rand.getrandbits(64), rand.getrandbits(64)]
+                                  for cell in xrange(cells)]
+    return _zobrist_tables[cells]
 
 
 class Game (object):
@@ -18,6 +35,7 @@ class Game (object):
         self.currentColor = 1 # The color whose turn it is
         self.history = []     # The history of strokes
         self.status = -1      # The status of the game as return by play
+        self.hash = 0         # The Zobrist hash of the position
 
     def play(self, move):
         """
@@ -37,6 +55,38 @@ class Game (object):
         """Return the list of all the possible moves for this turn."""
         pass
 
+    def moves_left(self):
+        """Return an upper bound of the number of moves left, None if unknown."""
+        return None
+
+    def canonical(self):
+        """
+        Return (hash, symmetry): the hash shared by the symmetric positions
+        and the index of the symmetry (0 being the identity) mapping the
+        position on the canonical one.
+        """
+        return self.hash, 0
+
+    def transform_move(self, move, symmetry, inverse=False):
+        """Return the image of a move by a symmetry (or by its inverse)."""
+        return move
+
+    def unique_moves(self, moves):
+        """Return the moves, without those symmetric to an earlier one."""
+        return moves
+
+    def iter_moves(self):
+        """
+        Generate the possible moves for this turn, the most promising first
+        when the game knows, so that a search stopping early does not build
+        them all.
+        """
+        return iter(self.possible_moves())
+
+    def is_legal(self, move):
+        """Return whether a move can be played this turn."""
+        return move in self.possible_moves()
+
     def to_string(self):
         """Return a string with a 'graphical' display of the board. """
         pass
@@ -58,8 +108,11 @@ class Game (object):
 class Move (object):
     """
     An abstract class for a Move.
+    Moves have slots rather than a dict: searches hold millions of them.
     """
 
+    __slots__ = ('color',)
+
     def __init__(self, color=None):
         """Create a move."""
         self.color = color
@@ -114,6 +167,21 @@ class Minimax_Player (Player):
     An abstract player.
     """
 
+    engine = 'minimax'  # The search engine, one of Minimax.ENGINES
+    max_depth = None    # Depth at which cutoff() stops the search (None: whole tree)
+    table = None        # An optional Minimax.TranspositionTable
+    ordering = None     # An optional move ordering, like Ordering.Ordering()
+    max_time = None     # Seconds per move, searching deeper and deeper until exhausted
+    max_nodes = None    # Same with a budget of nodes per move
+    processes = None    # Processes searching the root moves in parallel (0: as many as CPUs)
+                        # only for a full or max_depth search (not with max_time or
+                        # max_nodes), minimax or else negamax, each root move with
+                        # a new table set like 'table' (which stays empty)
+    database = None     # An optional Database.Database (needs eval_outcome)
+    book = None         # An optional Book.Book, whose moves are played without search
+    book_plies = 8      # Plies up to which the book is played
+    stats = None        # An optional Minimax.SearchStats summing the searches of the player
+
     def play(self, game):
         if self.color is None:
             raise RuntimeError("A player cannot play without an assigned color.")
@@ -121,5 +189,31 @@ class Minimax_Player (Player):
             raise RuntimeError("This player ({}) can't"
                                "play this turn ({}).".format(self.color,
                                                              game.currentColor))
-        value, move, strokes = Minimax.minimax(game, self, debug=False)
+        if self.book is not None and len(game.history) < self.book_plies:
+            move = self.book.move(game)
+            if move is not None:
+                return game.play(move)
+        engine = Minimax.ENGINES[self.engine]
+        if self.processes is not None and (self.max_time is not None or
+                                           self.max_nodes is not None):
+            raise RuntimeError("A parallel search has no time or node budget.")
+        started = time.time()
+        if self.processes is not None:
+            value, move, strokes = Parallel.search(game, self, self.processes or None,
+                                                   engine=self.engine, table=self.table,
+                                                   ordering=self.ordering, stats=self.stats)
+        elif self.max_time is None and self.max_nodes is None:
+            value, move, strokes = engine(game, self, table=self.table, ordering=self.ordering,
+                                          database=self.database, stats=self.stats)
+        else:
+            value, move, strokes = Minimax.iterative_deepening(game, self,
+                                                               max_time=self.max_time,
+                                                               max_nodes=self.max_nodes,
+                                                               table=self.table,
+                                                               ordering=self.ordering,
+                                                               engine=engine,
+                                                               database=self.database,
+                                                               stats=self.stats)
+        if self.stats is not None:
+            self.stats.searched(time.time() - started)
         return game.play(move)
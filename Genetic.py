@@ -5,25 +5,188 @@ Genetic algorithm(s).
 """
 
 
+import cPickle
+import os
+import random
+import threading
+import zlib
 
 
-def tough_world(generator, numGen, eval_fn, init_list=[]):
+def tournament_selection(scoredPopulation, size=3):
+    """Return the best of 'size' individuals picked at random."""
+    return max(random.sample(scoredPopulation, size), key=lambda sp: sp[0])[1]
+
+
+def rank_selection(scoredPopulation):
+    """
+    Return an individual picked with a probability proportional to its rank
+    (the population being sorted best first).
+    """
+    card = len(scoredPopulation)
+    pick = random.randint(1, card*(card+1)//2)
+    for i, (score, individual) in enumerate(scoredPopulation):
+        pick -= card - i
+        if pick <= 0:
+            return individual
+
+
+def save_checkpoint(filename, state):
+    """
+    Write a state (any picklable object) compressed in filename, from a
+    background thread which is returned. The file is written atomically: it
+    is only replaced once the new state is complete on disk.
+    """
+    data = zlib.compress(cPickle.dumps(state, 2))
+    def write():
+        tmp = filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, filename)
+    thread = threading.Thread(target=write)
+    thread.start()
+    return thread
+
+
+def load_checkpoint(filename):
+    """Return the state saved in filename."""
+    with open(filename, 'rb') as f:
+        return cPickle.loads(zlib.decompress(f.read()))
+
+
+def tough_world(generator, numGen, eval_fn, init_list=[], size=100, elite=2,
+                selection='tournament', tournament_size=3, crossover=0.7, mutation=0.01,
+                reuse_elite_fitness=False, statistics=None, verbose=True,
+                checkpoint=None, checkpoint_every=1):
+    """
+    Breed a population for numGen generations and return it as a list of
+    (score, individual), best first.
+
+    The population is completed up to 'size' with generator(), and scored by
+    eval_fn(population), the higher the better. Each generation keeps its
+    'elite' best individuals and is completed with the children of parents
+    chosen by 'tournament' or 'rank' selection: a pair of parents crossbreed
+    with probability 'crossover' (else they are cloned) and their children
+    mutate with probability 'mutation' per gene. Individuals must provide
+    clone(), mutate(probability) and crossbreed(other).
+
+    With reuse_elite_fitness, the elite keeps its score and only the children
+    are evaluated. Only set it when scores do not depend on the rest of the
+    population (e.g. Tournament.benchmark_panel): scores of schedulers like
+    round_robin are relative to the population they were played in, so old
+    elite scores and the children's ones would not compare.
+    If a list is given as 'statistics', a dict of statistics is appended to it
+    for each generation.
+
+    If a 'checkpoint' filename is given, the evaluated population, the state
+    of the random generator and the parameters are saved in it every
+    'checkpoint_every' generations, so that resume() can continue the run.
+    """
+
+    if selection not in ['tournament', 'rank']:
+        raise RuntimeError("Unknown selection: {}".format(selection))
+    options = {'size': size,
+               'elite': elite,
+               'selection': selection,
+               'tournament_size': tournament_size,
+               'crossover': crossover,
+               'mutation': mutation,
+               'reuse_elite_fitness': reuse_elite_fitness}
 
     # Build initial population
     population = list(init_list)
-    while len(population) < 100:
+    while len(population) < size:
         population.append(generator())
 
-    generation = 0
-    while True:
+    # Evaluate the population
+    scores = eval_fn(population)
+
+    return _evolve(population, scores, len(population), 0, numGen, eval_fn, options,
+                   statistics, verbose, checkpoint, checkpoint_every)
+
+
+def resume(checkpoint, eval_fn, numGen=None, statistics=None, verbose=True, checkpoint_every=1):
+    """
+    Continue the run of tough_world saved in 'checkpoint', exactly as it
+    would have gone on, up to numGen generations (by default, those planned).
+    The checkpoint keeps on being updated.
+    """
+    state = load_checkpoint(checkpoint)
+    random.setstate(state['random'])
+    if numGen is None:
+        numGen = state['numGen']
+    return _evolve(state['population'], state['scores'], state['evaluated'],
+                   state['generation'], numGen, eval_fn, state['options'],
+                   statistics, verbose, checkpoint, checkpoint_every)
+
+
+def _evolve(population, scores, evaluated, generation, numGen, eval_fn, options,
+            statistics, verbose, checkpoint, checkpoint_every):
+    """The generational loop of tough_world, from an evaluated population."""
+
+    size, elite = options['size'], options['elite']
+    if options['selection'] == 'tournament':
+        select = lambda sp: tournament_selection(sp, options['tournament_size'])
+    else:
+        select = rank_selection
+
+    writer = None
+    try:
+        while True:
+
+            scoredPopulation = sorted(zip(scores, population), key=lambda sp: sp[0], reverse=True)
+            stats = {'generation': generation,
+                     'best': scoredPopulation[0][0],
+                     'mean': float(sum(scores)) / len(scores),
+                     'worst': scoredPopulation[-1][0],
+                     'evaluated': evaluated}
+            if statistics is not None:
+                statistics.append(stats)
+            if verbose:
+                print "Generation {generation}: best {best}, mean {mean:.2f}, " \
+                      "worst {worst} ({evaluated} evaluated)".format(**stats)
 
-        # Evaluate the population
-        scores = eval_fn(population)
-        scoredPopulation = zip(scores, population)
+            # Save the run, without waiting for the file to be written
+            if checkpoint is not None and \
+               (generation % checkpoint_every == 0 or generation >= numGen):
+                if writer is not None:
+                    writer.join()
+                writer = save_checkpoint(checkpoint, {'population': population,
+                                                      'scores': scores,
+                                                      'evaluated': evaluated,
+                                                      'generation': generation,
+                                                      'numGen': numGen,
+                                                      'options': options,
+                                                      'random': random.getstate()})
 
-        if generation >= numGen:
-            break
+            if generation >= numGen:
+                return scoredPopulation
 
-        # Select the next generation
+            # Select the next generation
+            elites = scoredPopulation[:elite]
+            children = []
+            while len(children) < size - len(elites):
+                mummy, daddy = select(scoredPopulation), select(scoredPopulation)
+                # Crossbreeding and Mutation
+                if random.random() < options['crossover']:
+                    kids = mummy.crossbreed(daddy)
+                else:
+                    kids = [mummy.clone(), daddy.clone()]
+                for kid in kids:
+                    kid.mutate(options['mutation'])
+                children.extend(kids)
+            children = children[:size - len(elites)]
 
-        # Crossbreeding and Mutation
+            # Evaluate the new generation
+            population = [individual for score, individual in elites] + children
+            if options['reuse_elite_fitness']:
+                scores = [score for score, individual in elites] + eval_fn(children)
+                evaluated = len(children)
+            else:
+                scores = eval_fn(population)
+                evaluated = len(population)
+            generation += 1
+    finally:
+        if writer is not None:
+            writer.join()
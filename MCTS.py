@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+
+"""
+Monte Carlo Tree Search (UCT): an anytime alternative to minimax, which needs
+no evaluation function.
+"""
+
+import copy
+import math
+import multiprocessing
+import random
+import threading
+import time
+
+import Generic
+import Batch
+
+
+class Node (object):
+    """
+    A node of the search tree: the position reached by 'move'.
+    'wins' counts the playouts won by the player of 'move' (draws count half).
+    """
+
+    def __init__(self, move, parent, moves):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = moves    # The moves not expanded yet
+        self.visits = 0
+        self.wins = 0.
+
+    def select(self, exploration):
+        """Return the child with the best upper confidence bound (UCB1)."""
+        log = math.log(self.visits)
+        return max(self.children,
+                   key=lambda child: child.wins / child.visits +
+                                     exploration * math.sqrt(log / child.visits))
+
+    def find(self, move):
+        """Return the child reached by 'move', None if not expanded."""
+        for child in self.children:
+            if child.move == move:
+                return child
+        return None
+
+
+
+# The pools of processes of the root parallelization and their numbers of
+# workers, by number of processes asked for
+_pools = {}
+
+
+def _search_tree(task):
+    """
+    Search an independent tree in a worker and return the statistics of its
+    root: ([(move, visits, wins)], playouts).
+    """
+    game, player, seed = task
+    random.seed(seed)
+    root = player.search(game)
+    return [(child.move, child.visits, child.wins) for child in root.children], player.playouts
+
+
+def close():
+    """Terminate all the pools of processes."""
+    for pool, workers in _pools.values():
+        pool.terminate()
+        pool.join()
+    _pools.clear()
+
+
+
+def rollout(game):
+    """
+    Play random moves up to the end of the game, revert them and return
+    the number of (draws, wins of player 1, wins of player 2): one playout.
+    """
+    plies = 0
+    while game.status == -1:
+        game.play(random.choice(game.possible_moves()))
+        plies += 1
+    result = [0, 0, 0]
+    result[game.status] = 1
+    for i in xrange(plies):
+        game.revert()
+    return result
+
+
+
+class MCTS_Player (Generic.Player):
+    """
+    A player searching with UCT, within a budget of iterations and/or seconds
+    per move (the first exhausted stops the search).
+    Each iteration descends the tree, expands a node and plays random games
+    from it: a single one through play/revert, or 'batch' ones at once with
+    Batch (games with gravity only).
+    The subtree of the position reached is kept for the next move.
+
+    The search can run in parallel:
+     - root parallelization: 'processes' processes (0: as many as CPUs) each
+       search their own tree with the full budget, and the statistics of the
+       moves of the roots are summed;
+     - tree parallelization: 'threads' threads share the tree, each playing
+       on its own copy of the game. A thread descending a node gives it a
+       'virtual loss' until its playouts are backpropagated, so that the
+       others explore elsewhere. Only the playouts run outside the lock,
+       so this scales with the part of them done outside the interpreter
+       (e.g. with 'batch').
+    Trees are not kept between moves in root parallelization.
+    """
+
+    iterations = 1000   # Iterations per move (None: no limit)
+    max_time = None     # Seconds per move (None: no limit)
+    exploration = 1.4   # Weight of the exploration term of UCB1
+    batch = 0           # Playouts per iteration run by Batch (0: one serial playout)
+    reuse_tree = True   # Keep the subtree of the position reached between moves
+    processes = None    # Processes searching independent trees (0: as many as CPUs)
+    threads = None      # Threads searching a shared tree
+    virtual_loss = 1    # Visits (lost) added to the nodes being searched by a thread (>= 1)
+
+    def __init__(self, color=None):
+        Generic.Player.__init__(self, color)
+        self._root = None
+        self._history = None  # The moves leading to the root
+        self.playouts = 0     # Playouts run by the last search
+
+    def play(self, game):
+        if self.color is None:
+            raise RuntimeError("A player cannot play without an assigned color.")
+        if self.color != game.currentColor:
+            raise RuntimeError("This player ({}) can't "
+                               "play this turn ({}).".format(self.color,
+                                                             game.currentColor))
+        if self.processes is not None:
+            root = self.search_processes(game)
+        elif self.threads:
+            root = self.search_threads(game)
+        else:
+            root = self.search(game)
+        best = max(root.children, key=lambda child: child.visits)
+        status = game.play(best.move)
+        if self.reuse_tree and self.processes is None:
+            best.parent = None
+            self._root, self._history = best, list(game.history)
+        return status
+
+    def search(self, game):
+        """Run the iterations from the current position and return the root."""
+        root = self._reuse(game)
+        self.playouts = 0
+        deadline = None if self.max_time is None else time.time() + self.max_time
+        iteration = 0
+        while (self.iterations is None or iteration < self.iterations) and \
+              (deadline is None or time.time() < deadline):
+            self._iterate(game, root)
+            iteration += 1
+        return root
+
+    def search_processes(self, game):
+        """
+        Search independent trees in a pool of processes and return a root
+        whose children sum their statistics.
+        """
+        if self.processes not in _pools:
+            workers = self.processes or multiprocessing.cpu_count()
+            _pools[self.processes] = multiprocessing.Pool(workers), workers
+        pool, workers = _pools[self.processes]
+        player = copy.copy(self)
+        player._root = player._history = None
+        player.processes = None
+        tasks = [(game, player, random.getrandbits(32))
+                 for i in xrange(workers)]
+        root = Node(None, None, [])
+        self.playouts = 0
+        for stats, playouts in pool.map(_search_tree, tasks):
+            self.playouts += playouts
+            root.visits += playouts
+            for move, visits, wins in stats:
+                child = root.find(move)
+                if child is None:
+                    child = Node(move, root, [])
+                    root.children.append(child)
+                child.visits += visits
+                child.wins += wins
+        return root
+
+    def search_threads(self, game):
+        """Search the tree with several threads and return the root."""
+        if self.virtual_loss < 1:
+            # A child being expanded by a thread must not be selected unvisited
+            raise RuntimeError("Threads need a virtual loss of at least 1.")
+        root = self._reuse(game)
+        self.playouts = 0
+        deadline = None if self.max_time is None else time.time() + self.max_time
+        lock = threading.Lock()
+        budget = [self.iterations]
+        def work(game):
+            while deadline is None or time.time() < deadline:
+                with lock:
+                    if budget[0] is not None:
+                        if budget[0] <= 0:
+                            return
+                        budget[0] -= 1
+                self._iterate(game, root, lock)
+        workers = [threading.Thread(target=work, args=(copy.deepcopy(game),))
+                   for i in xrange(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return root
+
+    def _reuse(self, game):
+        """Return the node of the current position in the kept tree, or a new root."""
+        root = None
+        if self._root is not None and \
+           game.history[:len(self._history)] == self._history:
+            root = self._root
+            for move in game.history[len(self._history):]:
+                root = root.find(move)
+                if root is None:
+                    break
+        self._root = self._history = None
+        if root is None:
+            root = Node(None, None, game.possible_moves())
+        root.parent = None
+        return root
+
+    def _iterate(self, game, root, lock=None):
+        """
+        Select, expand, simulate and backpropagate once. The tree is only
+        modified while holding the lock, if any.
+        """
+        loss = 0 if lock is None else self.virtual_loss
+        if lock is not None:
+            lock.acquire()
+        try:
+            node = root
+            node.visits += loss
+            plies = 0
+            # Selection
+            while not node.untried and node.children:
+                node = node.select(self.exploration)
+                node.visits += loss
+                game.play(node.move)
+                plies += 1
+            # Expansion
+            if node.untried:
+                move = node.untried.pop(random.randrange(len(node.untried)))
+                game.play(move)
+                plies += 1
+                child = Node(move, node, game.possible_moves())
+                child.visits += loss
+                node.children.append(child)
+                node = child
+        finally:
+            if lock is not None:
+                lock.release()
+        # Simulation
+        if self.batch:
+            draws, wins1, wins2 = Batch.random_playouts(game, self.batch,
+                                                        seed=random.getrandbits(32))
+        else:
+            draws, wins1, wins2 = rollout(game)
+        for i in xrange(plies):
+            game.revert()
+        # Backpropagation
+        if lock is not None:
+            lock.acquire()
+        try:
+            playouts = draws + wins1 + wins2
+            self.playouts += playouts
+            while node is not None:
+                node.visits += playouts - loss
+                if node.move is not None:
+                    node.wins += (wins1 if node.move.color == 1 else wins2) + 0.5 * draws
+                node = node.parent
+        finally:
+            if lock is not None:
+                lock.release()
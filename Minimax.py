@@ -5,50 +5,321 @@ The minimax algo with alpha-beta prunning.
 """
 
 import sys
+import time
 
 
-def minimax(game, player, alpha=-sys.maxint, beta=sys.maxint, turn='max', depth=0, path=[], strokes=0, debug=False):
+# Kind of bound stored in the transposition table
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable (object):
+    """
+    A table of already searched positions indexed by their Zobrist hash.
+
+    Each entry is a tuple (hash, value, bound, draft, move) where the draft is
+    the depth that remained to be searched below the position. The table has a
+    fixed number of slots; on collision, the 'depth' policy keeps the entry with
+    the biggest draft whereas the 'always' policy keeps the newest one.
+    Values are those of the player who searched: a table must not be shared
+    between players (or colors).
+    A 'symmetric' table stores positions under their canonical hash (see
+    Game.canonical) so that symmetric positions share their entry; the moves
+    are stored as played on the canonical position and mapped back on lookup.
+    """
+
+    def __init__(self, size=2**20, replace='depth', symmetric=False):
+        if replace not in ['depth', 'always']:
+            raise RuntimeError("Unknown replacement policy: {}".format(replace))
+        self.size = size
+        self.replace = replace
+        self.symmetric = symmetric
+        self.hits = 0
+        self.misses = 0
+        self._entries = [None]*size
+
+    def __str__(self):
+        return "<TT: {} hits, {} misses ({:.1%})>".format(self.hits, self.misses,
+                                                          self.hit_rate())
+
+    def hit_rate(self):
+        """Return the ratio of successful lookups."""
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.
+
+    def lookup(self, key):
+        """Return the entry of the position, or None if unknown."""
+        entry = self._entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, value, bound, draft, move):
+        """Store the result of a search, according to the replacement policy."""
+        index = key % self.size
+        old = self._entries[index]
+        if old is not None and old[0] != key and \
+           self.replace == 'depth' and old[3] > draft:
+            return
+        self._entries[index] = (key, value, bound, draft, move)
+
+    def lookup_position(self, game):
+        """Return the entry of the position of a game, or None if unknown."""
+        if not self.symmetric:
+            return self.lookup(game.hash)
+        key, symmetry = game.canonical()
+        entry = self.lookup(key)
+        if entry is None or entry[4] is None or symmetry == 0:
+            return entry
+        return entry[:4] + (game.transform_move(entry[4], symmetry, inverse=True),)
+
+    def store_position(self, game, value, bound, draft, move):
+        """Store the result of the search of the position of a game."""
+        if not self.symmetric:
+            self.store(game.hash, value, bound, draft, move)
+            return
+        key, symmetry = game.canonical()
+        if move is not None:
+            move = game.transform_move(move, symmetry)
+        self.store(key, value, bound, draft, move)
+
+    def clear(self):
+        """Forget all the entries."""
+        self._entries = [None]*self.size
+        self.hits = 0
+        self.misses = 0
+
+
+class SearchStats (object):
+    """
+    Statistics of searches, filled by the engines they are given to: nodes
+    visited, leaves evaluated, cutoffs by depth, positions whose value came
+    from the transposition table and depth of the deepest node. Iterative
+    deepening also counts the nodes and seconds of each iteration, and
+    Minimax_Player the seconds of its searches. The statistics of several
+    searches (the moves of a game, the games of a tournament) are summed
+    with add().
+    'progress', if given, is called with the statistics every 'every' nodes.
+    """
+
+    def __init__(self, progress=None, every=1000):
+        self.progress = progress
+        self.every = every
+        self.clear()
+
+    def __str__(self):
+        ebf, nps = self.branching_factor(), self.nodes_per_second()
+        return "<Stats: {} nodes, {} leaves, {} cutoffs, {} TT hits, depth {}, " \
+               "EBF {}, {} nodes/s>".format(self.nodes, self.leaves, sum(self.cutoffs.values()),
+                                            self.tt_hits, self.depth,
+                                            "?" if ebf is None else "{:.2f}".format(ebf),
+                                            "?" if nps is None else int(nps))
+
+    def __getstate__(self):
+        # The progress callback is not sent to other processes
+        state = dict(self.__dict__)
+        state['progress'] = None
+        return state
+
+    def clear(self):
+        """Forget all the statistics."""
+        self.searches = 0     # Number of searches timed
+        self.time = 0.        # Seconds of the searches timed
+        self.nodes = 0
+        self.leaves = 0
+        self.tt_hits = 0
+        self.depth = 0        # Depth of the deepest node
+        self.cutoffs = {}     # Cutoffs by depth
+        self.iterations = {}  # [nodes, seconds] by depth of iterative deepening
+
+    def visit(self, depth):
+        """Count a node at 'depth'."""
+        self.nodes += 1
+        if self.depth < depth:
+            self.depth = depth
+        if self.progress is not None and self.nodes % self.every == 0:
+            self.progress(self)
+
+    def cutoff(self, depth):
+        """Count a cutoff at 'depth'."""
+        self.cutoffs[depth] = self.cutoffs.get(depth, 0) + 1
+
+    def iteration(self, depth, nodes, seconds):
+        """Count an iteration of iterative deepening completed at 'depth'."""
+        total = self.iterations.setdefault(depth, [0, 0.])
+        total[0] += nodes
+        total[1] += seconds
+
+    def searched(self, seconds):
+        """Count a search which lasted 'seconds'."""
+        self.searches += 1
+        self.time += seconds
+
+    def add(self, other):
+        """Add the statistics of other searches."""
+        self.searches += other.searches
+        self.time += other.time
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        self.tt_hits += other.tt_hits
+        self.depth = max(self.depth, other.depth)
+        for depth, count in other.cutoffs.iteritems():
+            self.cutoffs[depth] = self.cutoffs.get(depth, 0) + count
+        for depth, (nodes, seconds) in other.iterations.iteritems():
+            self.iteration(depth, nodes, seconds)
+
+    def branching_factor(self):
+        """
+        Return the effective branching factor: the ratio between the nodes of
+        the last two iterations of iterative deepening if any, or else
+        nodes**(1/depth). None if nothing was searched.
+        """
+        depths = sorted(self.iterations)
+        if len(depths) >= 2 and self.iterations[depths[-2]][0]:
+            return float(self.iterations[depths[-1]][0]) / self.iterations[depths[-2]][0]
+        if self.depth == 0:
+            return None
+        return self.nodes ** (1. / self.depth)
+
+    def nodes_per_second(self):
+        """Return the nodes searched per second, None if no search was timed."""
+        return self.nodes / self.time if self.time else None
+
+
+
+class SearchTimeout (Exception):
+    """Raised when a search exceeds its time or node budget."""
+    pass
+
+
+def minimax(game, player, alpha=-sys.maxint, beta=sys.maxint, turn='max', depth=0, path=[], strokes=0, table=None,
+            ordering=None, pv=None, line=None, deadline=None, max_nodes=None, database=None,
+            stats=None, debug=False):
     """
     Minimax algorithm with alpha-beta pruning.
+    If a transposition table is given, it is used to skip positions already
+    searched deep enough (a position requires player.max_depth-depth plies).
+    The moves are sorted by 'ordering' (see Ordering.Ordering), or else only
+    the best move stored in the table is tried first.
+    The moves of 'pv' (a principal variation) are tried first along the
+    variation, and 'line', if given, is filled with the principal variation found.
+    In a symmetric position, moves symmetric to an already tried one are
+    skipped (see Game.unique_moves).
+    The path of moves leading to the node is only built to be printed when
+    debugging.
+    A position found in 'database' (see Database.Database) with an exact
+    value is not searched: it is evaluated by player.eval_outcome(status,
+    strokes) from its outcome. Otherwise, its recorded move is tried first.
+    The search is counted in 'stats' (a SearchStats), if given.
+    SearchTimeout is raised once past the deadline or max_nodes: the moves
+    being searched are then left played on the game.
     """
 
     strokes += 1
 
-    if strokes % 1000 == 0:
-        print strokes
+    if (max_nodes is not None and strokes > max_nodes) or \
+       (deadline is not None and strokes % 64 == 0 and time.time() > deadline):
+        raise SearchTimeout()
+
+    if stats is not None:
+        stats.visit(depth)
 
     if debug:
         print "+{}MINIMAX: {}/{} (strokes:{})".format(".."*depth, player.color, turn, strokes)
         print "+{}{}".format(".."*depth, game.to_string().replace("\n", "\n+"+".."*depth))
 
-    # Get possible moves for current player
-    moves = game.possible_moves()
+    # Look for the position in the transposition table
+    hash_move = None
+    if table is not None:
+        draft = sys.maxint if player.max_depth is None else player.max_depth - depth
+        entry = table.lookup_position(game)
+        if entry is not None:
+            hash_move = entry[4]
+        if entry is not None and entry[3] >= draft and (depth > 0 or entry[4] is not None):
+            key, value, bound, _, move = entry
+            if bound == EXACT or \
+               (bound == LOWER and beta <= value) or \
+               (bound == UPPER and value <= alpha):
+                if line is not None:
+                    line[:] = [] if move is None else [move]
+                if stats is not None:
+                    stats.tt_hits += 1
+                return value, move, strokes
+        alpha0, beta0 = alpha, beta
+
+    # Look for the position in the database
+    if database is not None:
+        record = database.lookup(game)
+        if record is not None:
+            value, move = record
+            if value is not None:
+                if line is not None:
+                    line[:] = [move]
+                return player.eval_outcome(*database.outcome(game, value)), move, strokes
+            if hash_move is None:
+                hash_move = move
+
+    # Get possible moves for current player, unless the ordering generates them
+    lazy = ordering is not None and ordering.lazy and not pv
+    moves = None if lazy else game.possible_moves()
+    terminal = game.status != -1 if lazy else len(moves) == 0
 
     # If this is a terminal state or if the player decide to cut off
-    if len(moves) == 0 or player.cutoff(game, depth):
+    if terminal or player.cutoff(game, depth):
         e = player.eval(game)
+        if stats is not None:
+            stats.leaves += 1
         if debug:
             print "+{}=>val:{} for {}".format(".."*depth, e, ",".join([str(m) for m in path]))
+        if table is not None:
+            table.store_position(game, e, EXACT, sys.maxint if terminal else draft, None)
+        if line is not None:
+            line[:] = []
         return e, None, strokes
 
+    # Order the moves, the principal variation coming first anyway
+    if lazy:
+        moves = ordering.generate(game, depth, hash_move)
+    elif ordering is not None:
+        moves = ordering.order(game, moves, depth, hash_move)
+    elif hash_move is not None:
+        _bring_first(moves, hash_move)
+    if pv:
+        _bring_first(moves, pv[0])
+    moves = game.unique_moves(moves)
+
     # Max turn: Player tries to maximize the score when playing
     if turn == 'max':
         maxi = -sys.maxint
         movemaxi = None
         for move in moves:
             game.play(move)
+            childline = None if line is None else []
             value, nextbestmove, strokes = minimax(game, player, alpha, beta,
                                                    turn='min', depth=depth+1,
-                                                   path=path+[move], strokes=strokes,
-                                                   debug=debug)
+                                                   path=path+[move] if debug else path, strokes=strokes,
+                                                   table=table, ordering=ordering,
+                                                   pv=pv[1:] if pv and move == pv[0] else None,
+                                                   line=childline, deadline=deadline,
+                                                   max_nodes=max_nodes, database=database,
+                                                   stats=stats, debug=debug)
             game.revert()
             if maxi < value:
                 maxi, movemaxi = value, move
+                if line is not None:
+                    line[:] = [move] + childline
             if beta <= value:
+                if ordering is not None:
+                    ordering.cutoff(game, move, depth, _remaining(game, player, depth))
+                if stats is not None:
+                    stats.cutoff(depth)
                 break
             alpha = max(alpha, value)
         if debug:
             print "+{}=> max:{} for {}".format(".."*depth, maxi, movemaxi)
+        if table is not None:
+            _store(table, game, maxi, alpha0, beta0, draft, movemaxi)
         return maxi, movemaxi, strokes
 
     # Min turn: Opponent tries to minize the score when playing
@@ -57,16 +328,294 @@ def minimax(game, player, alpha=-sys.maxint, beta=sys.maxint, turn='max', depth=
         movemini = None
         for move in moves:
             game.play(move)
+            childline = None if line is None else []
             value, nextbestmove, strokes = minimax(game, player, alpha, beta,
                                                    turn='max', depth=depth+1,
-                                                   path=path+[move], strokes=strokes,
-                                                   debug=debug)
+                                                   path=path+[move] if debug else path, strokes=strokes,
+                                                   table=table, ordering=ordering,
+                                                   pv=pv[1:] if pv and move == pv[0] else None,
+                                                   line=childline, deadline=deadline,
+                                                   max_nodes=max_nodes, database=database,
+                                                   stats=stats, debug=debug)
             game.revert()
             if value < mini:
                 mini, movemini = value, move
+                if line is not None:
+                    line[:] = [move] + childline
             if value <= alpha:
+                if ordering is not None:
+                    ordering.cutoff(game, move, depth, _remaining(game, player, depth))
+                if stats is not None:
+                    stats.cutoff(depth)
                 break
             beta = min(beta, value)
         if debug:
             print "+{}=> min:{} for {}".format(".."*depth, mini, movemini)
+        if table is not None:
+            _store(table, game, mini, alpha0, beta0, draft, movemini)
         return mini, movemini, strokes
+
+
+def _bring_first(moves, first):
+    """Move 'first' at the head of the list of moves, if present."""
+    for i, move in enumerate(moves):
+        if move == first:
+            moves.insert(0, moves.pop(i))
+            return
+
+
+def _remaining(game, player, depth):
+    """Return the number of plies left before the horizon (or the end of the game)."""
+    return game.moves_left() if player.max_depth is None else player.max_depth - depth
+
+
+def _store(table, game, value, alpha, beta, draft, move):
+    """Store a search result, deducing its bound from the initial window."""
+    if value <= alpha:
+        bound = UPPER
+    elif beta <= value:
+        bound = LOWER
+    else:
+        bound = EXACT
+    table.store_position(game, value, bound, draft, move)
+
+
+def negamax(game, player, alpha=-sys.maxint, beta=sys.maxint, depth=0, strokes=0, table=None,
+            ordering=None, pv=None, line=None, deadline=None, max_nodes=None, database=None,
+            stats=None):
+    """
+    Negamax algorithm with principal variation search: once a first move is
+    searched, the others are searched with a null window which only proves
+    that they are not better, and re-searched with the full window if they are.
+    Values are those of the color to play: at the root, the player's ones.
+    Options are those of minimax, but the values stored in the transposition
+    table are those of the color to play so it must not be shared with minimax.
+    """
+
+    strokes += 1
+
+    if (max_nodes is not None and strokes > max_nodes) or \
+       (deadline is not None and strokes % 64 == 0 and time.time() > deadline):
+        raise SearchTimeout()
+
+    if stats is not None:
+        stats.visit(depth)
+
+    # Look for the position in the transposition table
+    hash_move = None
+    if table is not None:
+        draft = sys.maxint if player.max_depth is None else player.max_depth - depth
+        entry = table.lookup_position(game)
+        if entry is not None:
+            hash_move = entry[4]
+            if entry[3] >= draft and (depth > 0 or hash_move is not None):
+                key, value, bound, _, move = entry
+                if bound == EXACT or \
+                   (bound == LOWER and beta <= value) or \
+                   (bound == UPPER and value <= alpha):
+                    if line is not None:
+                        line[:] = [] if move is None else [move]
+                    if stats is not None:
+                        stats.tt_hits += 1
+                    return value, move, strokes
+        alpha0, beta0 = alpha, beta
+
+    # Look for the position in the database
+    if database is not None:
+        record = database.lookup(game)
+        if record is not None:
+            value, move = record
+            if value is not None:
+                e = player.eval_outcome(*database.outcome(game, value))
+                if game.currentColor != player.color:
+                    e = -e
+                if line is not None:
+                    line[:] = [move]
+                return e, move, strokes
+            if hash_move is None:
+                hash_move = move
+
+    # If this is a terminal state or if the player decide to cut off
+    lazy = ordering is not None and ordering.lazy and not pv
+    moves = None if lazy else game.possible_moves()
+    terminal = game.status != -1 if lazy else len(moves) == 0
+    if terminal or player.cutoff(game, depth):
+        e = player.eval(game)
+        if stats is not None:
+            stats.leaves += 1
+        if game.currentColor != player.color:
+            e = -e
+        if table is not None:
+            table.store_position(game, e, EXACT, sys.maxint if terminal else draft, None)
+        if line is not None:
+            line[:] = []
+        return e, None, strokes
+
+    # Order the moves, the principal variation coming first anyway
+    if lazy:
+        moves = ordering.generate(game, depth, hash_move)
+    elif ordering is not None:
+        moves = ordering.order(game, moves, depth, hash_move)
+    elif hash_move is not None:
+        _bring_first(moves, hash_move)
+    if pv:
+        _bring_first(moves, pv[0])
+    moves = game.unique_moves(moves)
+
+    best, bestmove = None, None
+    for move in moves:
+        childpv = pv[1:] if pv and move == pv[0] else None
+        childline = None if line is None else []
+        game.play(move)
+        if bestmove is None:
+            value, nextbestmove, strokes = negamax(game, player, -beta, -alpha, depth+1, strokes,
+                                                   table, ordering, childpv, childline,
+                                                   deadline, max_nodes, database, stats)
+            value = -value
+        else:
+            value, nextbestmove, strokes = negamax(game, player, -alpha-1, -alpha, depth+1, strokes,
+                                                   table, ordering, childpv, childline,
+                                                   deadline, max_nodes, database, stats)
+            value = -value
+            if alpha < value < beta:
+                childline = None if line is None else []
+                value, nextbestmove, strokes = negamax(game, player, -beta, -value, depth+1, strokes,
+                                                       table, ordering, childpv, childline,
+                                                       deadline, max_nodes, database, stats)
+                value = -value
+        game.revert()
+        if best is None or best < value:
+            best, bestmove = value, move
+            if line is not None:
+                line[:] = [move] + childline
+        alpha = max(alpha, value)
+        if beta <= alpha:
+            if ordering is not None:
+                ordering.cutoff(game, move, depth, _remaining(game, player, depth))
+            if stats is not None:
+                stats.cutoff(depth)
+            break
+
+    if table is not None:
+        _store(table, game, best, alpha0, beta0, draft, bestmove)
+    return best, bestmove, strokes
+
+
+def aspiration(game, player, window=100, guess=None, strokes=0, table=None,
+               ordering=None, pv=None, line=None, deadline=None, max_nodes=None, database=None,
+               stats=None):
+    """
+    Negamax search within a window of +/- 'window' around 'guess' (by default
+    the value stored in the table for the position, if any). If the value
+    falls outside, the position is searched again with the full window.
+    """
+    if guess is None and table is not None:
+        entry = table.lookup_position(game)
+        if entry is not None:
+            guess = entry[1]
+    if guess is None:
+        return negamax(game, player, strokes=strokes, table=table, ordering=ordering,
+                       pv=pv, line=line, deadline=deadline, max_nodes=max_nodes,
+                       database=database, stats=stats)
+    alpha, beta = guess - window, guess + window
+    value, move, strokes = negamax(game, player, alpha, beta, strokes=strokes, table=table,
+                                   ordering=ordering, pv=pv, line=line,
+                                   deadline=deadline, max_nodes=max_nodes, database=database,
+                                   stats=stats)
+    if value <= alpha or beta <= value:
+        value, move, strokes = negamax(game, player, strokes=strokes, table=table,
+                                       ordering=ordering, pv=pv, line=line,
+                                       deadline=deadline, max_nodes=max_nodes,
+                                       database=database, stats=stats)
+    return value, move, strokes
+
+
+def mtdf(game, player, guess=None, strokes=0, table=None,
+         ordering=None, pv=None, line=None, deadline=None, max_nodes=None, database=None,
+         stats=None):
+    """
+    MTD(f): converge to the value with null window negamax searches, starting
+    from 'guess' (by default the value stored in the table for the position,
+    or 0). It relies on a transposition table, created if none is given.
+    """
+    if table is None:
+        table = TranspositionTable(2**16)
+    if guess is None:
+        entry = table.lookup_position(game)
+        guess = 0 if entry is None else entry[1]
+    lower, upper = -sys.maxint, sys.maxint
+    value, move = guess, None
+    while lower < upper:
+        beta = value + 1 if value == lower else value
+        passline = None if line is None else []
+        value, passmove, strokes = negamax(game, player, beta-1, beta, strokes=strokes,
+                                           table=table, ordering=ordering, pv=pv,
+                                           line=passline, deadline=deadline,
+                                           max_nodes=max_nodes, database=database,
+                                           stats=stats)
+        if value < beta:
+            upper = value
+        else:
+            lower = value
+        # Only a search failing high proves that its move is the best one
+        if value >= beta or move is None:
+            move = passmove
+            if line is not None:
+                line[:] = passline
+    return value, move, strokes
+
+
+def iterative_deepening(game, player, max_time=None, max_nodes=None, max_depth=None, table=None,
+                        ordering=None, engine=minimax, database=None, stats=None):
+    """
+    Search deeper and deeper, setting player.max_depth, until the time (in
+    seconds) or node budget is exhausted or max_depth is reached. Return the
+    result of the deepest completed search of the engine (one of ENGINES).
+    Each search tries first the principal variation of the previous one. The
+    budget applies to the first one (depth 1) too: if even this one is not
+    completed, the first legal move is returned, with a value of None.
+    The completed iterations are counted in 'stats', if given.
+    """
+    deadline = None if max_time is None else time.time() + max_time
+    ply = len(game.history)
+    saved_depth = player.max_depth
+    best = None
+    pv = []
+    strokes = 0
+    depth = 0
+    try:
+        while max_depth is None or depth < max_depth:
+            depth += 1
+            player.max_depth = depth
+            line = []
+            started, nodes = time.time(), strokes
+            try:
+                value, move, strokes = engine(game, player, strokes=strokes,
+                                              table=table, ordering=ordering, pv=pv,
+                                              line=line, deadline=deadline,
+                                              max_nodes=max_nodes, database=database,
+                                              stats=stats)
+            except SearchTimeout:
+                while len(game.history) > ply:
+                    game.revert()
+                break
+            if stats is not None:
+                stats.iteration(depth, strokes - nodes, time.time() - started)
+            best = value, move, strokes
+            pv = line
+            # Deeper searches would not find more moves
+            if game.moves_left() is not None and depth >= game.moves_left():
+                break
+    finally:
+        player.max_depth = saved_depth
+    if best is None:
+        moves = game.possible_moves()
+        return None, moves[0] if moves else None, strokes
+    return best[0], best[1], strokes
+
+
+# The search engines, by name
+ENGINES = {'minimax': minimax,
+           'negamax': negamax,
+           'aspiration': aspiration,
+           'mtdf': mtdf}
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+"""
+Move ordering for the alpha-beta search.
+"""
+
+
+def center_distance(game, move):
+    """
+    Return how far (in half cells) a move is from the center of the board.
+    Central tokens belong to more lines, so they are usually better moves.
+    """
+    if hasattr(move, 'column'):
+        return abs(2*move.column - game.X + 1)
+    x, y = move.position
+    return abs(2*x - game.X + 1) + abs(2*y - game.Y + 1)
+
+
+
+class Ordering (object):
+    """
+    Order the moves of a node so that alpha-beta prunes as much as possible:
+     - the hash move (the best move found by a previous search),
+     - the killer moves: the last moves which caused a cutoff at the same depth,
+     - the moves by history score: how often (and how deep) they caused cutoffs,
+     - the moves closest to the center of the board.
+    Each stage can be disabled. The search calls order() on each node and
+    cutoff() each time a move refutes its node.
+    A 'lazy' ordering is rather asked for generate(), which yields the moves
+    one at a time from the game, so that nodes cut off after their first
+    moves do not generate the others.
+    """
+
+    lazy = False
+
+    def __init__(self, center=True, killers=2, history=True):
+        self.center = center
+        self.killers = killers
+        self.history = history
+        self.clear()
+
+    def clear(self):
+        """Forget the killer moves and the history."""
+        self._killers = {}  # Killer moves by depth, most recent first
+        self._history = {}  # History score by move
+
+    def order(self, game, moves, depth, hash_move=None):
+        """Return the moves of the node, the most promising first."""
+        killers = self._killers.get(depth, [])
+        def key(move):
+            if move == hash_move:
+                return (0, 0, 0)
+            if move in killers:
+                return (1, killers.index(move), 0)
+            return (2,
+                    -self._history.get(move, 0) if self.history else 0,
+                    center_distance(game, move) if self.center else 0)
+        return sorted(moves, key=key)
+
+    def generate(self, game, depth, hash_move=None):
+        """Generate the moves of the node, the most promising first."""
+        return iter(self.order(game, game.possible_moves(), depth, hash_move))
+
+    def cutoff(self, game, move, depth, remaining=None):
+        """
+        Record that 'move' caused a cutoff at 'depth', 'remaining' plies above
+        the horizon of the search (None if unknown).
+        """
+        if self.killers:
+            killers = self._killers.setdefault(depth, [])
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[self.killers:]
+        if self.history:
+            weight = 1 if remaining is None else remaining * remaining
+            self._history[move] = self._history.get(move, 0) + weight
+
+
+
+class CenterFirst (Ordering):
+    """
+    A static ordering: the moves closest to the center first (after the
+    hash move, if any). It is lazy, relying on Game.iter_moves: the game's
+    moves must only run out when it ends (as in Connect games).
+    """
+
+    lazy = True
+
+    def __init__(self):
+        Ordering.__init__(self, center=True, killers=0, history=False)
+
+    def generate(self, game, depth, hash_move=None):
+        if hash_move is not None and game.is_legal(hash_move):
+            yield hash_move
+        for move in game.iter_moves():
+            if move != hash_move:
+                yield move
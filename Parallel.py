@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+"""
+Parallel search: the moves of the root are split between processes.
+"""
+
+import copy
+import ctypes
+import multiprocessing
+import sys
+
+import Minimax
+
+
+# Most moves a root can have
+MAX_ROOT_MOVES = 1024
+
+# In the workers: the values found for the moves of the root, by index
+_values = None
+
+# The pools of processes, by number of processes
+_splitters = {}
+
+
+def _init_worker(values):
+    global _values
+    _values = values
+
+
+def _search_root_move(task):
+    """
+    Search one move of the root in a worker and return (index, value, strokes,
+    stats), stats being the Minimax.SearchStats of the search if 'stats' is set.
+    The window is opened by the best value found for the previous moves so far.
+    """
+    game, player, index, move, alpha, engine, table, ordering, stats = task
+    alpha = max([alpha] + _values[:index])
+    table = None if table is None else Minimax.TranspositionTable(*table)
+    stats = Minimax.SearchStats() if stats else None
+    game.play(move)
+    if engine == 'minimax':
+        value, nextmove, strokes = Minimax.minimax(game, player, alpha, sys.maxint,
+                                                   turn='min', depth=1,
+                                                   table=table, ordering=ordering,
+                                                   database=player.database, stats=stats)
+    else:
+        value, nextmove, strokes = Minimax.negamax(game, player, -sys.maxint, -alpha,
+                                                   depth=1, table=table, ordering=ordering,
+                                                   database=player.database, stats=stats)
+        value = -value
+    game.revert()
+    if alpha < value:
+        _values[index] = value
+    return index, value, strokes, stats
+
+
+
+class RootSplitter (object):
+    """
+    A pool of processes searching the moves of the root in parallel.
+
+    The eldest move is searched first, alone, to get a bound (Young Brothers
+    Wait), then the others are searched by the workers, each with its own copy
+    of the game. A worker prunes with the best value found so far for the
+    moves preceding its own one, so that the chosen move is the one the
+    serial search would choose.
+    """
+
+    def __init__(self, processes=None):
+        self.values = multiprocessing.Array(ctypes.c_long, MAX_ROOT_MOVES, lock=False)
+        self.pool = multiprocessing.Pool(processes, _init_worker, (self.values,))
+
+    def search(self, game, player, engine='minimax', table=None, ordering=None,
+               stats=None):
+        """
+        Search the game for player (whose turn it is) and return the same
+        (value, move, strokes) as the serial engine. Engines other than
+        minimax are all searched as negamax.
+        Each task gets its own transposition table, with the size, replacement
+        policy and symmetry of 'table' if given, and its own copy of the
+        ordering: 'table' itself is neither read nor filled. The player's
+        database, if any, is opened again by the workers, which share its
+        pages.
+        The statistics of all the tasks are added to 'stats', if given.
+        """
+        if stats is not None:
+            stats.visit(0)
+        moves = game.possible_moves()
+        if len(moves) == 0 or player.cutoff(game, 0):
+            if stats is not None:
+                stats.leaves += 1
+            return player.eval(game), None, 1
+        if ordering is not None:
+            moves = ordering.order(game, moves, 0)
+        moves = game.unique_moves(moves)
+        # Do not ship the player's table and statistics to the workers
+        player = copy.copy(player)
+        player.table = None
+        player.stats = None
+        if table is not None:
+            table = (table.size, table.replace, table.symmetric)
+        for i in xrange(len(moves)):
+            self.values[i] = -sys.maxint
+        # Search the eldest move, and then its brothers in parallel
+        global _values
+        _values = self.values
+        tasks = [(game, player, i, move, -sys.maxint, engine, table, ordering,
+                  stats is not None)
+                 for i, move in enumerate(moves)]
+        results = [_search_root_move(tasks[0])]
+        results.extend(self.pool.imap_unordered(_search_root_move, tasks[1:]))
+        # Choose the move as the serial search would
+        results.sort()
+        strokes = 1
+        best, bestmove = None, None
+        for index, value, nodes, task_stats in results:
+            strokes += nodes
+            if stats is not None:
+                stats.add(task_stats)
+            if best is None or best < value:
+                best, bestmove = value, moves[index]
+        return best, bestmove, strokes
+
+    def close(self):
+        """Terminate the processes."""
+        self.pool.terminate()
+        self.pool.join()
+
+
+
+def search(game, player, processes=None, engine='minimax', table=None, ordering=None,
+           stats=None):
+    """
+    Search with a RootSplitter of 'processes' processes (by default, as many
+    as CPUs), created at the first call and reused afterward.
+    """
+    if processes not in _splitters:
+        _splitters[processes] = RootSplitter(processes)
+    return _splitters[processes].search(game, player, engine=engine,
+                                        table=table, ordering=ordering,
+                                        stats=stats)
+
+
+def close():
+    """Terminate all the pools of processes."""
+    for splitter in _splitters.values():
+        splitter.close()
+    _splitters.clear()
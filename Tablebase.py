@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+"""
+Perfect play tables: small 'connect k' games (TicTacToe, CrossFour 4x4 and
+5x5...) are solved once and for all, and the value and best move of every
+reachable position are saved in a file, looked up in O(1) afterward.
+
+The file starts with a header (magic, columns, rows, k, gravity, capacity)
+followed by an open addressing hash table of 'capacity' entries (canonical
+hash, value, move), probed linearly from hash % capacity. It is memory
+mapped: only the pages probed are read.
+
+Run as a script, it builds the tables named on the command line, by default
+tictactoe and crossfour4x4: crossfour5x5 is only built when named.
+"""
+
+import struct
+
+import numpy as np
+
+import Generic
+
+
+MAGIC = 'SKTB'
+HEADER = struct.Struct('<4sBBBBQ')
+ENTRY = np.dtype([('key', '<u8'), ('value', 'i1'), ('move', 'i1')])
+
+# Value of a position whose color to play has lost: a position won (lost) in
+# n plies is worth WIN-n (n-WIN), a draw 0.
+WIN = 64
+
+
+def _backup(value):
+    """Return the value of a position from the value of its best child."""
+    if value > 0:
+        return -(value - 1)
+    if value < 0:
+        return -(value + 1)
+    return 0
+
+
+def _code(game, move):
+    """Return a move as a small integer: its column, or its cell."""
+    if game.gravity:
+        return move.column
+    x, y = move.position
+    return x*game.Y + y
+
+
+def solve(game, table=None):
+    """
+    Solve all the positions reachable from the game (whose moves are played
+    and reverted) and return a dict {canonical hash: value*256 + move code}
+    for the open ones, values being those of the color to play.
+    """
+    if table is None:
+        table = {}
+    _solve(game, table)
+    return table
+
+
+def _solve(game, table):
+    key, symmetry = game.canonical()
+    if key in table:
+        return table[key] >> 8
+    best, bestmove = None, None
+    for move in game.unique_moves(game.possible_moves()):
+        status = game.play(move)
+        if status == -1:
+            value = _backup(_solve(game, table))
+        elif status == 0:
+            value = 0
+        else:
+            value = WIN - 1
+        game.revert()
+        if best is None or best < value:
+            best, bestmove = value, move
+    table[key] = best*256 + _code(game, game.transform_move(bestmove, symmetry))
+    return best
+
+
+def build(game, filename, load=0.5):
+    """
+    Solve the positions reachable from the game and save them in filename,
+    the hash table being filled at 'load'. Return the number of positions.
+    """
+    positions = solve(game)
+    capacity = max(int(len(positions) / load), 1)
+    entries = np.zeros(capacity, dtype=ENTRY)
+    entries['move'] = -1
+    for key, packed in positions.iteritems():
+        index = key % capacity
+        while entries['move'][index] != -1:
+            index = (index + 1) % capacity
+        entries[index] = (key, packed >> 8, packed & 255)
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, game.X, game.Y, game.K, game.gravity, capacity))
+        entries.tofile(f)
+    return len(positions)
+
+
+
+class Tablebase (object):
+    """A table saved by build(), memory mapped."""
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            header = f.read(HEADER.size)
+        magic, self.X, self.Y, self.K, gravity, self.capacity = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise RuntimeError("{} is not a table.".format(filename))
+        self.gravity = bool(gravity)
+        self._entries = np.memmap(filename, dtype=ENTRY, mode='r',
+                                  offset=HEADER.size, shape=(self.capacity,))
+
+    def lookup(self, game):
+        """
+        Return (value, move) for the position of the game (value of the color
+        to play, see WIN), or None if it is not in the table.
+        """
+        if (game.X, game.Y, game.K, game.gravity) != (self.X, self.Y, self.K, self.gravity):
+            raise RuntimeError("This table is not for this game.")
+        key, symmetry = game.canonical()
+        index = key % self.capacity
+        while True:
+            entry = self._entries[index]
+            if entry['move'] == -1:
+                return None
+            if entry['key'] == key:
+                break
+            index = (index + 1) % self.capacity
+        code = int(entry['move'])
+        move = game.move(code if self.gravity else (code // self.Y, code % self.Y))
+        return int(entry['value']), game.transform_move(move, symmetry, inverse=True)
+
+
+
+class Tablebase_Player (Generic.Player):
+    """A player with perfect play, reading its moves in a Tablebase."""
+
+    def __init__(self, tablebase, color=None):
+        Generic.Player.__init__(self, color)
+        self.tablebase = tablebase
+
+    def play(self, game):
+        result = self.tablebase.lookup(game)
+        if result is None:
+            raise RuntimeError("This position is not in the table.")
+        return game.play(result[1])
+
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    import TicTacToe
+    import CrossFour
+    games = {'tictactoe': TicTacToe.Game(),
+             'crossfour4x4': CrossFour.Game(4, 4),
+             'crossfour5x5': CrossFour.Game(5, 5)}
+    # The tables built by default: 5x5 takes tens of minutes and GBs of memory
+    built = ['crossfour4x4', 'tictactoe']
+    for name in sys.argv[1:] or built:
+        start = time.time()
+        count = build(games[name], name + '.tb')
+        print "{}.tb: {} positions in {:.1f} seconds".format(name, count, time.time() - start)
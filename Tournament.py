@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+"""
+Tournaments between CrossFour players.
+
+The schedulers take a list of genomes and return a list of scores, the
+higher the better, as expected by Genetic.tough_world. They add the
+statistics of the searches of the games played to 'stats' (a
+Minimax.SearchStats), if given.
+"""
+
+import math
+import multiprocessing
+import random
+import shelve
+
+import Book
+import CrossFour
+import Minimax
+
+
+def run_game(player1, player2, columns=8, rows=8, display=False):
+    """
+    Play a game of CrossFour and return 1 if player1 wins, -1 if player2 wins
+    or 0 for a draw.
+    """
+    game = CrossFour.Game(columns, rows)
+    player1.color = game.currentColor
+    player2.color = game.currentColor % 2 + 1
+    while True:
+        for player in [player1, player2]:
+            winner = player.play(game)
+            if winner != -1 and display:
+                game.display()
+            if winner == player1.color:
+                return 1
+            elif winner == player2.color:
+                return -1
+            elif winner == 0:
+                return 0
+
+
+# The books opened by this process, by filename
+_books = {}
+
+
+def play_pairing(task):
+    """
+    Have two genomes play a game each as first player and return
+    (a, b, score, stats) where the score is the one of a (from -2 to 2) and
+    stats the Minimax.SearchStats of both players if 'stats' is set.
+    Players use the opening book in the 'book' file, if any.
+    """
+    a, b, genome_a, genome_b, seed, columns, rows, depth, book, stats = task
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        player_a = CrossFour.AdvancedPlayer(list(genome_a))
+        player_b = CrossFour.AdvancedPlayer(list(genome_b))
+        player_a.max_depth = player_b.max_depth = depth
+        stats = Minimax.SearchStats() if stats else None
+        player_a.stats = player_b.stats = stats
+        if book is not None:
+            if book not in _books:
+                _books[book] = Book.Book(book)
+            player_a.book = player_b.book = _books[book]
+        score = run_game(player_a, player_b, columns, rows)
+        score -= run_game(player_b, player_a, columns, rows)
+    finally:
+        random.setstate(state)
+    return a, b, score, stats
+
+
+class MatchCache (object):
+    """
+    The results of the pairings already played, by genomes, board size,
+    depth and book: players being deterministic, so are their games.
+    Results are kept in memory, or in a shelve file if a filename is given.
+    """
+
+    def __init__(self, filename=None):
+        self.hits = 0
+        self.misses = 0
+        self._results = {} if filename is None else shelve.open(filename, protocol=2)
+
+    def _key(self, genome_a, genome_b, columns, rows, depth, book):
+        if book is None:
+            return repr((list(genome_a), list(genome_b), columns, rows, depth))
+        return repr((list(genome_a), list(genome_b), columns, rows, depth, book))
+
+    def get(self, genome_a, genome_b, columns, rows, depth, book=None):
+        """Return the score of genome_a against genome_b, None if not played yet."""
+        # a against b is the opposite of b against a
+        if list(genome_b) < list(genome_a):
+            score = self.get(genome_b, genome_a, columns, rows, depth, book)
+            return None if score is None else -score
+        score = self._results.get(self._key(genome_a, genome_b, columns, rows, depth, book))
+        if score is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return score
+
+    def put(self, genome_a, genome_b, columns, rows, depth, score, book=None):
+        """Record the score of genome_a against genome_b."""
+        if list(genome_b) < list(genome_a):
+            genome_a, genome_b, score = genome_b, genome_a, -score
+        self._results[self._key(genome_a, genome_b, columns, rows, depth, book)] = score
+
+    def close(self):
+        """Write the results on disk, if in a file."""
+        if not isinstance(self._results, dict):
+            self._results.close()
+
+
+def run_pairings(genomes, pairings, max_workers=None, seed=0, columns=8, rows=8, depth=3,
+                 cache=None, book=None, stats=None):
+    """
+    Play all the pairings (a, b) of genomes and yield the results (a, b, score)
+    as they complete. Games are spread over a pool of max_workers processes
+    (by default, as many as CPUs; 1 plays them in this process).
+    Each pairing is seeded from 'seed' and its index, so that results do not
+    depend on the number of workers.
+    Pairings found in the cache (a MatchCache) are not played again.
+    Players play the moves of the opening book in the 'book' file, if any.
+    The statistics of the searches of the games played are added to 'stats'
+    (a Minimax.SearchStats), if given.
+    """
+    tasks = []
+    for i, (a, b) in enumerate(pairings):
+        score = None
+        if cache is not None:
+            score = cache.get(genomes[a], genomes[b], columns, rows, depth, book)
+        if score is None:
+            tasks.append((a, b, genomes[a], genomes[b], seed + i, columns, rows, depth, book,
+                          stats is not None))
+        else:
+            yield a, b, score
+    if len(tasks) == 0:
+        return
+    if max_workers == 1:
+        results = (play_pairing(task) for task in tasks)
+    else:
+        pool = multiprocessing.Pool(max_workers)
+        results = pool.imap_unordered(play_pairing, tasks)
+    try:
+        for a, b, score, pairing_stats in results:
+            if stats is not None:
+                stats.add(pairing_stats)
+            if cache is not None:
+                cache.put(genomes[a], genomes[b], columns, rows, depth, score, book)
+            yield a, b, score
+    finally:
+        if max_workers != 1:
+            pool.terminate()
+            pool.join()
+
+
+def round_robin(genomes, max_workers=None, seed=0, columns=8, rows=8, depth=3, cache=None,
+                book=None, stats=None):
+    """
+    Have every genome play twice against every other one and return their scores.
+    """
+    card = len(genomes)
+    pairings = [(a, b) for a in xrange(card) for b in xrange(a+1, card)]
+    scores = [0]*card
+    for a, b, score in run_pairings(genomes, pairings, max_workers, seed,
+                                    columns, rows, depth, cache, book, stats):
+        scores[a] += score
+        scores[b] -= score
+    return scores
+
+
+def swiss(genomes, max_workers=None, seed=0, columns=8, rows=8, depth=3, cache=None,
+          rounds=None, book=None, stats=None):
+    """
+    Swiss system: at each round, genomes are sorted by score and paired with
+    the next one they have not met yet. An odd genome out gets a bye (no
+    score). By default, there are log2(n)+1 rounds: O(n.log(n)) games.
+    """
+    card = len(genomes)
+    if rounds is None:
+        rounds = int(math.ceil(math.log(max(card, 2), 2))) + 1
+    scores = [0]*card
+    met = set()
+    for r in xrange(rounds):
+        ranking = sorted(xrange(card), key=lambda i: (-scores[i], i))
+        pairings = []
+        while len(ranking) > 1:
+            a = ranking.pop(0)
+            others = [b for b in ranking if (min(a, b), max(a, b)) not in met] or ranking
+            b = others[0]
+            ranking.remove(b)
+            met.add((min(a, b), max(a, b)))
+            pairings.append((a, b))
+        for a, b, score in run_pairings(genomes, pairings, max_workers,
+                                        seed + r*card, columns, rows, depth, cache, book,
+                                        stats):
+            scores[a] += score
+            scores[b] -= score
+    return scores
+
+
+def successive_halving(genomes, max_workers=None, seed=0, columns=8, rows=8, depth=3, cache=None,
+                       games=4, book=None, stats=None):
+    """
+    Race: at each round, the genomes still running play 'games' pairings
+    against random opponents also running, and the worse half is eliminated.
+    A genome scores the number of rounds it survived, plus its mean score
+    (scaled in [0, 0.8]) in the round it was eliminated: O(n) games.
+    """
+    rand = random.Random(seed)
+    card = len(genomes)
+    scores = [0.]*card
+    running = range(card)
+    r = 0
+    while len(running) > 1:
+        total = dict([(i, 0) for i in running])
+        played = dict([(i, 0) for i in running])
+        pairings = []
+        for a in running:
+            for g in xrange(games // 2):
+                b = rand.choice([i for i in running if i != a])
+                pairings.append((a, b))
+        for a, b, score in run_pairings(genomes, pairings, max_workers,
+                                        seed + r*card*games, columns, rows, depth, cache,
+                                        book, stats):
+            total[a] += score
+            total[b] -= score
+            played[a] += 1
+            played[b] += 1
+        mean = dict([(i, float(total[i]) / max(played[i], 1)) for i in running])
+        for i in running:
+            scores[i] = r + (mean[i] + 2) / 5
+        running.sort(key=lambda i: (-mean[i], i))
+        running = running[:len(running) // 2]
+        r += 1
+    for i in running:
+        scores[i] = r
+    return scores
+
+
+# An arbitrary panel of opponents for the benchmark
+PANEL = [[50, 10, 40, 60, 5, 30],
+         [10, 90, 20, 80, 30, 70],
+         [90, 50, 80, 20, 60, 10],
+         [30, 30, 60, 60, 0, 50]]
+
+def benchmark_panel(genomes, max_workers=None, seed=0, columns=8, rows=8, depth=3, cache=None,
+                    panel=PANEL, book=None, stats=None):
+    """
+    Have every genome play against a fixed panel of opponents: O(n) games.
+    Unlike the other schedulers, scores do not depend on the rest of the
+    population, so they can be compared between generations.
+    """
+    card = len(genomes)
+    pairings = [(a, card + b) for a in xrange(card) for b in xrange(len(panel))]
+    scores = [0]*card
+    for a, b, score in run_pairings(list(genomes) + list(panel), pairings, max_workers,
+                                    seed, columns, rows, depth, cache, book, stats):
+        scores[a] += score
+    return scores
+
+
+# The schedulers, by name
+SCHEDULERS = {'round_robin': round_robin,
+              'swiss': swiss,
+              'successive_halving': successive_halving,
+              'benchmark_panel': benchmark_panel}
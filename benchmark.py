@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+
+"""
+Benchmarks of the games, of the search engines and of the Monte Carlo
+search. Run as a script, the suite prints its results as JSON so that they
+can be compared between versions:
+
+    python benchmark.py [--quick] [--output FILE] [BENCHMARK...]
+
+Workloads are seeded: two runs search the same positions.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+import CrossFour
+import CrossThree
+import MCTS
+import Minimax
+import Ordering
+import Parallel
+import TicTacToe
+import Tournament
+
+
+# Some CrossFour positions: (columns, rows, moves played)
+POSITIONS = [(4, 4, [1, 2]),
+             (4, 4, [0, 3, 1]),
+             (5, 5, [2, 1, 2, 2, 3, 4, 0, 0, 1]),
+             (5, 5, [2, 2, 1, 3, 2, 1, 4, 0, 3, 3])]
+
+# An arbitrary genome for the players that evaluate non final states
+GENOME = [50, 10, 40, 60, 5, 30]
+
+# Mid-game CrossFour positions for the fixed depth searches
+MIDGAMES = [(8, 8, [3, 4, 4, 3, 2, 5]),
+            (8, 8, [3, 3, 4, 2, 5, 6, 4, 4, 2, 5]),
+            (8, 8, [0, 7, 3, 4, 3, 4, 5, 2, 2, 5, 6, 1]),
+            (7, 6, [3, 2, 3, 3, 4, 2, 1, 5])]
+
+# The games whose play/revert throughput is measured, by name
+GAMES = {'TicTacToe': lambda: TicTacToe.Game(),
+         'CrossThree 4x4': lambda: CrossThree.Game(4, 4),
+         'CrossFour 7x6': lambda: CrossFour.Game(7, 6),
+         'CrossFour 8x8': lambda: CrossFour.Game(8, 8),
+         'CrossFour 8x8 bitboard': lambda: CrossFour.Game(8, 8, bitboard=True,
+                                                          track_lines=False)}
+
+# The boards counted by perft: (columns, rows, depth)
+PERFT = [(5, 5, 6), (7, 6, 5), (8, 8, 5)]
+
+# The games which can be solved, by name: (game, player)
+SOLVES = {'TicTacToe': lambda: (TicTacToe.Game(), TicTacToe.Player(1)),
+          'CrossFour 4x4': lambda: (CrossFour.Game(4, 4), CrossFour.Player(1)),
+          'CrossFour 4x5': lambda: (CrossFour.Game(4, 5), CrossFour.Player(1)),
+          'CrossFour 5x5': lambda: (CrossFour.Game(5, 5), CrossFour.Player(1))}
+
+# The games solved by default: 5x5 takes about 20 million nodes (minutes)
+SOLVED = ['CrossFour 4x4', 'CrossFour 4x5', 'TicTacToe']
+
+
+def play_revert(games=sorted(GAMES), seconds=1., seed=0):
+    """
+    Play random games up to their end and revert them for 'seconds' seconds
+    on each game and return a list of (game, plies, seconds, plies per
+    second), a ply being a move played and reverted.
+    """
+    results = []
+    for name in games:
+        rand = random.Random(seed)
+        game = GAMES[name]()
+        plies = 0
+        start = time.time()
+        while time.time() - start < seconds:
+            while game.status == -1:
+                game.play(rand.choice(game.possible_moves()))
+                plies += 1
+            while game.history:
+                game.revert()
+        elapsed = time.time() - start
+        results.append((name, plies, elapsed, plies / elapsed))
+    return results
+
+
+def perft(game, depth):
+    """
+    Return the number of positions reached by playing all the sequences of
+    'depth' moves from the game (games ending earlier count as one).
+    """
+    if depth == 0 or game.status != -1:
+        return 1
+    count = 0
+    for move in game.possible_moves():
+        game.play(move)
+        count += perft(game, depth - 1)
+        game.revert()
+    return count
+
+
+def perft_counts(boards=PERFT):
+    """
+    Count the positions of perft on empty CrossFour boards and return a list
+    of (columns, rows, depth, positions, seconds, positions per second).
+    """
+    results = []
+    for columns, rows, depth in boards:
+        start = time.time()
+        count = perft(CrossFour.Game(columns, rows), depth)
+        elapsed = time.time() - start
+        results.append((columns, rows, depth, count, elapsed, count / elapsed))
+    return results
+
+
+def solve_times(games=SOLVED, table_size=2**20):
+    """
+    Solve each game from its start, searching the whole tree with minimax,
+    a symmetric transposition table and Ordering, and return a list of
+    (game, value, nodes, seconds).
+    """
+    results = []
+    for name in games:
+        game, player = SOLVES[name]()
+        start = time.time()
+        value, move, strokes = Minimax.minimax(game, player,
+                                               table=Minimax.TranspositionTable(table_size,
+                                                                                symmetric=True),
+                                               ordering=Ordering.Ordering())
+        results.append((name, value, strokes, time.time() - start))
+    return results
+
+
+def fixed_depth(positions=MIDGAMES, depth=4, engines=['minimax', 'negamax'], table=True,
+                ordering=True):
+    """
+    Search each position at a fixed depth with an AdvancedPlayer and each
+    engine and return a list of (position index, engine, value, move, nodes,
+    leaves, cutoffs, TT hits, effective branching factor, seconds, nodes per
+    second).
+    """
+    results = []
+    for i, (columns, rows, moves) in enumerate(positions):
+        game = CrossFour.Game(columns, rows)
+        for move in moves:
+            game.play(move)
+        for name in engines:
+            player = CrossFour.AdvancedPlayer(GENOME, game.currentColor)
+            player.max_depth = depth
+            stats = Minimax.SearchStats()
+            start = time.time()
+            value, move, strokes = Minimax.ENGINES[name](
+                game, player,
+                table=Minimax.TranspositionTable(2**18) if table else None,
+                ordering=Ordering.Ordering() if ordering else None, stats=stats)
+            stats.searched(time.time() - start)
+            results.append((i, name, value, move.column, stats.nodes, stats.leaves,
+                            sum(stats.cutoffs.values()), stats.tt_hits,
+                            stats.branching_factor(), stats.time, stats.nodes_per_second()))
+    return results
+
+
+def tournament_speed(genomes=Tournament.PANEL, columns=8, rows=8, depth=2, max_workers=1):
+    """
+    Play a round robin between the genomes and return a list of (games,
+    seconds, games per second, nodes, nodes per second).
+    """
+    stats = Minimax.SearchStats()
+    start = time.time()
+    Tournament.round_robin(genomes, max_workers=max_workers, columns=columns, rows=rows,
+                           depth=depth, stats=stats)
+    elapsed = time.time() - start
+    games = len(genomes) * (len(genomes) - 1)
+    return [(games, elapsed, games / elapsed, stats.nodes, stats.nodes / elapsed)]
+
+
+def compare_engines(positions=POSITIONS, depth=None, table=True, ordering=True):
+    """
+    Search each position with each engine and return a list of
+    (position index, engine, value, nodes, seconds).
+    The whole tree is searched if depth is None, else an AdvancedPlayer
+    searches 'depth' plies.
+    """
+    results = []
+    for i, (columns, rows, moves) in enumerate(positions):
+        game = CrossFour.Game(columns, rows)
+        for move in moves:
+            game.play(move)
+        for name in sorted(Minimax.ENGINES):
+            if depth is None:
+                player = CrossFour.Player(game.currentColor)
+            else:
+                player = CrossFour.AdvancedPlayer(GENOME, game.currentColor)
+                player.max_depth = depth
+            start = time.time()
+            value, move, strokes = Minimax.ENGINES[name](
+                game, player,
+                table=Minimax.TranspositionTable(2**18) if table else None,
+                ordering=Ordering.Ordering() if ordering else None)
+            results.append((i, name, value, strokes, time.time() - start))
+    return results
+
+
+def parallel_scaling(processes=[1, 2, 4, 8], depth=5, moves=[3, 4, 4, 3, 2, 5]):
+    """
+    Search a CrossFour 8x8 position with a RootSplitter of each number of
+    processes and return a list of (processes, value, move, nodes, seconds).
+    """
+    game = CrossFour.Game(8, 8)
+    for move in moves:
+        game.play(move)
+    player = CrossFour.AdvancedPlayer(GENOME, game.currentColor)
+    player.max_depth = depth
+    results = []
+    for count in processes:
+        splitter = Parallel.RootSplitter(count)
+        start = time.time()
+        value, move, strokes = splitter.search(game, player)
+        results.append((count, value, move.column, strokes, time.time() - start))
+        splitter.close()
+    return results
+
+
+def mcts_scaling(workers=[1, 2, 4, 8], iterations=200, batch=16, moves=[3, 4, 4, 3, 2, 5]):
+    """
+    Search a CrossFour 8x8 position with the root and tree parallel Monte
+    Carlo searches, for each number of workers, and return a list of
+    (mode, workers, playouts, seconds, playouts per second).
+    """
+    game = CrossFour.Game(8, 8)
+    for move in moves:
+        game.play(move)
+    results = []
+    for mode in ['processes', 'threads']:
+        for count in workers:
+            player = MCTS.MCTS_Player(game.currentColor)
+            player.iterations = iterations
+            player.batch = batch
+            setattr(player, mode, count)
+            if mode == 'processes':
+                # Start the pool out of the measure
+                player.search_processes(game)
+            start = time.time()
+            if mode == 'processes':
+                player.search_processes(game)
+            else:
+                player.search_threads(game)
+            seconds = time.time() - start
+            results.append((mode, count, player.playouts, seconds, player.playouts / seconds))
+    MCTS.close()
+    return results
+
+
+# The benchmarks of the suite, by name: (function, names of the fields of its results)
+SUITE = {'play_revert': (play_revert, ['game', 'plies', 'seconds', 'plies_per_second']),
+         'perft': (perft_counts, ['columns', 'rows', 'depth', 'positions', 'seconds',
+                                  'positions_per_second']),
+         'solve': (solve_times, ['game', 'value', 'nodes', 'seconds']),
+         'fixed_depth': (fixed_depth, ['position', 'engine', 'value', 'move', 'nodes', 'leaves',
+                                       'cutoffs', 'tt_hits', 'branching_factor', 'seconds',
+                                       'nodes_per_second']),
+         'tournament': (tournament_speed, ['games', 'seconds', 'games_per_second', 'nodes',
+                                           'nodes_per_second']),
+         'engines': (compare_engines, ['position', 'engine', 'value', 'nodes', 'seconds']),
+         'parallel': (parallel_scaling, ['processes', 'value', 'move', 'nodes', 'seconds']),
+         'mcts': (mcts_scaling, ['mode', 'workers', 'playouts', 'seconds',
+                                 'playouts_per_second'])}
+
+# Smaller workloads of the benchmarks, to check quickly that they run
+QUICK = {'play_revert': {'seconds': 0.1},
+         'perft': {'boards': [(5, 5, 4), (8, 8, 3)]},
+         'solve': {'games': ['TicTacToe']},
+         'fixed_depth': {'positions': MIDGAMES[:1], 'depth': 2},
+         'tournament': {'genomes': Tournament.PANEL[:2], 'columns': 5, 'rows': 5, 'depth': 1},
+         'engines': {'positions': POSITIONS[:1]},
+         'parallel': {'processes': [1, 2], 'depth': 3},
+         'mcts': {'workers': [1, 2], 'iterations': 20}}
+
+
+def run(names=sorted(SUITE), quick=False, solve=None):
+    """
+    Run the benchmarks of the suite and return a JSON-serializable dict:
+    the environment and, by benchmark, the list of its results as dicts.
+    'solve' replaces the games solved, if given.
+    """
+    report = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'python': platform.python_version(),
+              'numpy': np.__version__,
+              'platform': platform.platform(),
+              'quick': quick,
+              'benchmarks': {}}
+    for name in names:
+        function, fields = SUITE[name]
+        options = dict(QUICK[name]) if quick else {}
+        if name == 'solve' and solve:
+            options['games'] = solve
+        report['benchmarks'][name] = [dict(zip(fields, result))
+                                      for result in function(**options)]
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the benchmarks and print their "
+                                                 "results as JSON.")
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help="among {} (default: all)".format(", ".join(sorted(SUITE))))
+    parser.add_argument('--quick', action='store_true',
+                        help="run smaller workloads, only to check that they run")
+    parser.add_argument('--solve', action='append', metavar='GAME',
+                        help="solve this game, among {} (default: {})".format(
+                            ", ".join(sorted(SOLVES)), ", ".join(SOLVED)))
+    parser.add_argument('--output', help="write the results in this file")
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in SUITE:
+            parser.error("unknown benchmark: {}".format(name))
+    for name in args.solve or []:
+        if name not in SOLVES:
+            parser.error("unknown game: {}".format(name))
+    report = run(args.benchmarks or sorted(SUITE), args.quick, args.solve)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True, separators=(',', ': '))
+        print
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True, separators=(',', ': '))
@@ -1,9 +1,13 @@
 #!/usr/bin/env python
 
+import os
+
 from Generic import Interactive_Player, Random_Player
 import TicTacToe
 import CrossFour
-from Genetic import tough_world
+import Tournament
+from Tournament import run_game
+from Genetic import tough_world, resume
 
 
 #
@@ -30,47 +34,35 @@ def interactive_run_game(game, player1, player2):
 #
 
 
-def breed():
-    "Generate the best CrossFour player ever!!"
-    return tough_world(CrossFour.AdvancedPlayer, 10, eval_population)
-
-
-def eval_population(population):
-    """Evaluate all the menbers of a population by having them fight each others."""
-    card = len(population)
-    scores = [0]*card
-    total_played = [0]*card
-    for a in xrange(card):
-        for b in xrange(a+1, card):
-            print "Playing {} against {}".format(population[a], population[b])
-            score = run_game(population[a], population[b])
-            score -= run_game(population[b], population[a])
-            scores[a] += score
-            scores[b] -= score
-            total_played[a] += 1
-            total_played[b] += 1
-            print " - score: ", score
-    print "scores: ", scores
-    print "total: ", total_played
-    return scores
-
-
-def run_game(player1, player2):
-    game = CrossFour.Game(8, 8)
-    player1.color = game.currentColor
-    player2.color = game.currentColor % 2 + 1
-    while True:
-        for player in [player1, player2]:
-            winner = player.play(game)
-            if winner == player1.color:
-                game.display()
-                return 1
-            elif winner == player2.color:
-                game.display()
-                return -1
-            elif winner == 0:
-                game.display()
-                return 0
+def breed(cache_file=None, checkpoint=None, book=None):
+    """
+    Generate the best CrossFour player ever!!
+    The results of the games are cached, in cache_file if given.
+    The run is saved in checkpoint if given, and resumed from it if it exists.
+    Players play the moves of the opening book in the 'book' file, if any.
+    """
+    cache = Tournament.MatchCache(cache_file)
+    eval_fn = lambda population: eval_population(population, cache=cache, book=book)
+    try:
+        if checkpoint is not None and os.path.exists(checkpoint):
+            return resume(checkpoint, eval_fn)
+        return tough_world(CrossFour.AdvancedPlayer, 10, eval_fn, checkpoint=checkpoint)
+    finally:
+        cache.close()
+
+
+def eval_population(population, max_workers=None, seed=0, scheduler='round_robin', cache=None,
+                    book=None):
+    """
+    Evaluate all the menbers of a population by having them fight each others.
+    The scheduler (one of Tournament.SCHEDULERS) decides who plays against whom.
+    Games are played by a pool of max_workers processes (by default, as many as
+    CPUs), except those whose result is in the cache (a Tournament.MatchCache).
+    Players play the moves of the opening book in the 'book' file, if any.
+    """
+    return Tournament.SCHEDULERS[scheduler]([player.genome for player in population],
+                                            max_workers=max_workers, seed=seed, cache=cache,
+                                            book=book)
 
 
 if __name__ == '__main__':
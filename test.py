@@ -1,6 +1,12 @@
 #!/usr/bin/env python
 
 import re, os, sys
+import cPickle
+import json
+import multiprocessing
+import random
+import tempfile
+import time
 import difflib
 import unittest
 
@@ -8,7 +14,18 @@ import Generic
 import TicTacToe
 import CrossThree
 import CrossFour
+import Connect
 import Minimax
+import Ordering
+import Parallel
+import Tournament
+import Genetic
+import Batch
+import MCTS
+import Tablebase
+import Database
+import Book
+import benchmark
 
 
 
@@ -82,6 +99,45 @@ class CrossFourTest(unittest.TestCase):
         self.assertEqual(g._compute_status(), 2)
         self.assertEqual(g.status, 2)
 
+    def testBitboard(self):
+        rand = random.Random(0)
+        for i in range(50):
+            g = CrossFour.Game(6, 6)
+            b = CrossFour.Game(6, 6, bitboard=True, track_lines=i % 2 == 0)
+            while g.status == -1:
+                column = rand.choice(g.possible_moves()).column
+                self.assertEqual(g.play(column), b.play(column))
+                self.assertEqual(b.status, b._compute_status())
+                self.assertEqual(g.to_string(), b.to_string())
+            self.assertEqual(g.hash, b.hash)
+            while g.history:
+                g.revert(); b.revert()
+            self.assertEqual(b._bits, [None, 0, 0])
+        self.assertEqual(b.open_lines, None)
+        self.assertRaises(RuntimeError, CrossFour.Game, 6, 6, track_lines=False)
+        # Players evaluate untracked games from scratch
+        p = CrossFour.AdvancedPlayer([50, 10, 40, 60, 5, 30], 1)
+        for column in [3, 3, 2]:
+            g.play(column); b.play(column)
+        self.assertEqual(p.eval(b), p.eval(g))
+        self.assertEqual(CrossFour.features(b, 2), CrossFour.features(g, 2))
+        self.assertEqual(Minimax.minimax(b, p)[:2], Minimax.minimax(g, p)[:2])
+        # Without gravity
+        g, b = TicTacToe.Game(), TicTacToe.Game(bitboard=True, track_lines=False)
+        for position in [(1, 1), (0, 0), (2, 0), (0, 1)]:
+            self.assertEqual(g.play(position), b.play(position))
+            self.assertEqual(g.possible_moves(), b.possible_moves())
+        self.assertRaises(RuntimeError, b.play, (1, 1))
+        self.assertEqual(b.play((0, 2)), 1)
+
+    def testIncrementalStatus(self):
+        rand = random.Random(1)
+        for i in range(50):
+            g = CrossFour.Game(7, 7)
+            while g.status == -1:
+                status = g.play(rand.choice(g.possible_moves()))
+                self.assertEqual(status, g._compute_status())
+
 
 
 class TicTacToeTest(unittest.TestCase):
@@ -127,6 +183,707 @@ class TicTacToeTest(unittest.TestCase):
 
 
 
+class ConnectTest(unittest.TestCase):
+
+    def testNonSquare(self):
+        g = Connect.Game(7, 4, 4)
+        g._board[3:7, 3] = 1
+        self.assertEqual(g._compute_status(), 1)
+        g = Connect.Game(4, 7, 4)
+        g._board[3, 3:7] = 2
+        self.assertEqual(g._compute_status(), 2)
+
+    def testConnectFive(self):
+        g = Connect.Game(9, 9, 5)
+        for column in [0, 0, 1, 1, 2, 2, 3, 3]:
+            self.assertEqual(g.play(column), -1)
+        self.assertEqual(g.play(4), 1)
+        g.revert()
+        self.assertEqual(g.status, -1)
+        self.assertEqual(g.play(5), -1)
+
+    def testNoGravity(self):
+        g = Connect.Game(4, 3, 3, gravity=False)
+        for position in [(1, 2), (0, 0), (2, 2), (0, 1)]:
+            self.assertEqual(g.play(position), -1)
+        self.assertEqual(len(g.possible_moves()), 8)
+        self.assertEqual(g.play((3, 2)), 1)
+
+    def testOpenLines(self):
+        random.seed(0)
+        for g in [CrossFour.Game(7, 6), CrossFour.Game(5, 5, bitboard=True), TicTacToe.Game()]:
+            for i in xrange(5):
+                while g.status == -1:
+                    g.play(random.choice(g.possible_moves()))
+                    self.assertEqual(g.open_lines, g.compute_open_lines())
+                while g.history:
+                    g.revert()
+                    self.assertEqual(g.open_lines, g.compute_open_lines())
+        # Open threes and twos along the first row
+        g = CrossFour.Game(7, 6)
+        for column in [0, 6, 1, 5, 2]:
+            g.play(column)
+        self.assertEqual(g.open_lines[1][2:], [1, 1, 0])
+        self.assertEqual(g.open_lines[2][2:], [1, 0, 0])
+        player = CrossFour.AdvancedPlayer([0, 0, 10, 1, 100, 5], color=2)
+        self.assertEqual(player.eval(g), 10*1 + 1*2 + 100*5 + 5)
+
+    def testMoves(self):
+        g = CrossFour.Game(7, 6)
+        moves = g.possible_moves()
+        self.assertTrue(all(a is b for a, b in zip(moves, g.possible_moves())))
+        self.assertFalse(hasattr(moves[0], '__dict__'))
+        g.play(3)
+        self.assertTrue(g.history[0] is moves[3])
+        self.assertEqual(g.transform_move(g.move(1), 1), g.move(5))
+        self.assertEqual(cPickle.loads(cPickle.dumps(g.history[0])), Connect.Move(3, 1))
+        self.assertEqual(cPickle.loads(cPickle.dumps(g.history[0], 2)), Connect.Move(3, 1))
+        self.assertRaises(RuntimeError, g.play, 7)
+        self.assertRaises(RuntimeError, g.play, Connect.Move(2, 1))
+        # Moves without a color still take the current one
+        g.play(Connect.Move(2))
+        self.assertEqual(g.history[-1], g.move(2, 2))
+        g = TicTacToe.Game()
+        g.play((1, 1))
+        self.assertTrue(g.history[0] is g.move((1, 1), 1))
+        self.assertFalse(g.is_legal(g.move((1, 1))))
+        self.assertTrue(g.is_legal(g.move((0, 1))))
+
+
+
+class MinimaxTest(unittest.TestCase):
+
+    def testZobrist(self):
+        g = CrossFour.Game()
+        self.assertEqual(g.hash, 0)
+        g.play(1); g.play(2); g.play(1)
+        h = g.hash
+        g.revert(); g.revert(); g.revert()
+        self.assertEqual(g.hash, 0)
+        g.play(1); g.play(2); g.play(1)
+        self.assertEqual(g.hash, h)
+
+    def testTranspositionTable(self):
+        g = TicTacToe.Game()
+        p = TicTacToe.Player(1)
+        value, move, strokes = Minimax.minimax(g, p)
+        table = Minimax.TranspositionTable(size=2**12)
+        tvalue, tmove, tstrokes = Minimax.minimax(g, p, table=table)
+        self.assertEqual(value, tvalue)
+        self.assertEqual(move.position, tmove.position)
+        self.assertTrue(tstrokes < strokes)
+        self.assertTrue(table.hits > 0)
+        self.assertEqual(g.hash, 0)
+
+    def testIterativeDeepening(self):
+        g = CrossFour.Game(6, 6)
+        for column in [2, 3, 3, 1]:
+            g.play(column)
+        p = CrossFour.AdvancedPlayer(color=1)
+        value, move, strokes = Minimax.minimax(g, p)
+        ivalue, imove, istrokes = Minimax.iterative_deepening(g, p, max_depth=3)
+        self.assertEqual(value, ivalue)
+        self.assertEqual(p.max_depth, 3)
+        # A tight budget still gives a move and leaves the game untouched
+        ivalue, imove, istrokes = Minimax.iterative_deepening(g, p, max_nodes=50)
+        self.assertTrue(imove in g.possible_moves())
+        self.assertEqual(len(g.history), 4)
+        self.assertEqual(p.max_depth, 3)
+        # The budget applies to the first iteration too
+        ivalue, imove, istrokes = Minimax.iterative_deepening(g, p, max_nodes=1)
+        self.assertEqual((ivalue, imove), (None, g.possible_moves()[0]))
+        self.assertEqual(len(g.history), 4)
+        # Players searching the whole tree stop at max_depth
+        g = CrossFour.Game(5, 4)
+        p = CrossFour.Player(1)
+        p.max_time = 0.05
+        started = time.time()
+        p.play(g)
+        self.assertTrue(time.time() - started < 5)
+        self.assertEqual(p.max_depth, None)
+        p.max_depth = 2
+        self.assertEqual(Minimax.minimax(g, p, turn='min')[0], 10)
+        p = TicTacToe.Player(1)
+        p.max_depth = 2
+        stats = Minimax.SearchStats()
+        self.assertEqual(Minimax.minimax(TicTacToe.Game(), p, stats=stats)[0], 10)
+        self.assertEqual(stats.depth, 2)
+
+    def testOrdering(self):
+        g = TicTacToe.Game()
+        p = TicTacToe.Player(1)
+        value, move, strokes = Minimax.minimax(g, p)
+        for ordering in [Ordering.CenterFirst(), Ordering.Ordering()]:
+            ovalue, omove, ostrokes = Minimax.minimax(g, p, ordering=ordering)
+            self.assertEqual(value, ovalue)
+            self.assertTrue(ostrokes < strokes)
+        g = CrossFour.Game(6, 6)
+        moves = Ordering.CenterFirst().order(g, g.possible_moves(), 0)
+        self.assertEqual([m.column for m in moves], [2, 3, 1, 4, 0, 5])
+        # Lazy generation gives the same order, the hash move first if legal
+        for g in [CrossFour.Game(6, 6), TicTacToe.Game()]:
+            g.play(g.possible_moves()[0])
+            for hash_move in [None, g.possible_moves()[-1], g.history[0]]:
+                self.assertEqual(list(Ordering.CenterFirst().generate(g, 0, hash_move)),
+                                 Ordering.CenterFirst().order(g, g.possible_moves(), 0, hash_move))
+
+    def testEngines(self):
+        g = CrossFour.Game(4, 4)
+        for column in [1, 2]:
+            g.play(column)
+        p = CrossFour.Player(1)
+        value, move, strokes = Minimax.minimax(g, p)
+        for name, engine in Minimax.ENGINES.items():
+            evalue, emove, estrokes = engine(g, p)
+            self.assertEqual(value, evalue, name)
+            evalue, emove, estrokes = engine(g, p, table=Minimax.TranspositionTable(2**14))
+            self.assertEqual(value, evalue, name)
+            g.play(emove)
+            self.assertEqual(Minimax.minimax(g, p, turn='min')[0], value, name)
+            g.revert()
+        self.assertEqual(len(g.history), 2)
+
+    def testParallel(self):
+        g = CrossFour.Game(6, 6)
+        for column in [2, 3, 3, 1]:
+            g.play(column)
+        p = CrossFour.AdvancedPlayer([50, 10, 40, 60, 5, 30], 1)
+        p.max_depth = 3
+        for engine in ['minimax', 'negamax']:
+            value, move, strokes = Minimax.ENGINES[engine](g, p)
+            pvalue, pmove, pstrokes = Parallel.search(g, p, 2, engine=engine)
+            self.assertEqual(value, pvalue)
+            self.assertEqual(move, pmove)
+        self.assertEqual(len(g.history), 4)
+        g = CrossFour.Game(4, 4)
+        g.play(1); g.play(2)
+        p = CrossFour.Player(1)
+        value, move, strokes = Minimax.minimax(g, p)
+        self.assertEqual(Parallel.search(g, p, 2)[:2], (value, move))
+        # The statistics of the workers are gathered
+        stats = Minimax.SearchStats()
+        pvalue, pmove, pstrokes = Parallel.search(g, p, 2, stats=stats)
+        self.assertEqual(stats.nodes, pstrokes)
+        self.assertTrue(stats.leaves > 0)
+        # The tables of the workers are set like the player's one
+        table = Minimax.TranspositionTable(2**12, symmetric=True)
+        self.assertEqual(Parallel.search(g, p, 2, table=table)[:2], (value, move))
+        p.table, p.processes = table, 2
+        p.play(g)
+        self.assertEqual(g.history[-1], move)
+        g.revert()
+        # A parallel search has no budget
+        p.max_time = 1.
+        self.assertRaises(RuntimeError, p.play, g)
+        self.assertEqual(len(g.history), 2)
+        Parallel.close()
+
+    def testStats(self):
+        g = TicTacToe.Game()
+        p = TicTacToe.Player(1)
+        calls = []
+        stats = Minimax.SearchStats(progress=lambda stats: calls.append(stats.nodes), every=100)
+        value, move, strokes = Minimax.minimax(g, p, table=Minimax.TranspositionTable(2**12),
+                                               stats=stats)
+        self.assertEqual(stats.nodes, strokes)
+        self.assertEqual(calls, range(100, strokes + 1, 100))
+        self.assertTrue(0 < stats.leaves < strokes)
+        self.assertTrue(stats.tt_hits > 0)
+        self.assertTrue(sum(stats.cutoffs.values()) > 0)
+        self.assertEqual(stats.depth, 9)
+        self.assertEqual(stats.nodes_per_second(), None)
+        self.assertEqual(cPickle.loads(cPickle.dumps(stats, 2)).nodes, strokes)
+        # Iterations of iterative deepening
+        g = CrossFour.Game(6, 6)
+        p = CrossFour.AdvancedPlayer([50, 10, 40, 60, 5, 30], 1)
+        stats = Minimax.SearchStats()
+        value, move, strokes = Minimax.iterative_deepening(g, p, max_depth=3,
+                                                           engine=Minimax.negamax, stats=stats)
+        self.assertEqual(sorted(stats.iterations), [1, 2, 3])
+        self.assertEqual(sum(nodes for nodes, seconds in stats.iterations.values()), strokes)
+        self.assertEqual(stats.branching_factor(),
+                         float(stats.iterations[3][0]) / stats.iterations[2][0])
+        # The searches of a player are summed over its moves
+        p.max_depth = 2
+        p.stats = Minimax.SearchStats()
+        p.play(g)
+        g.play(0)
+        p.play(g)
+        self.assertEqual(p.stats.searches, 2)
+        self.assertTrue(p.stats.time > 0)
+        total = Minimax.SearchStats()
+        total.add(p.stats)
+        total.add(p.stats)
+        self.assertEqual(total.nodes, 2 * p.stats.nodes)
+        self.assertEqual(total.cutoffs[1], 2 * p.stats.cutoffs[1])
+
+    def testReplacement(self):
+        table = Minimax.TranspositionTable(size=4, replace='depth')
+        table.store(1, 10, Minimax.EXACT, 5, None)
+        table.store(5, 20, Minimax.EXACT, 2, None)
+        self.assertEqual(table.lookup(1)[1], 10)
+        self.assertEqual(table.lookup(5), None)
+        table = Minimax.TranspositionTable(size=4, replace='always')
+        table.store(1, 10, Minimax.EXACT, 5, None)
+        table.store(5, 20, Minimax.EXACT, 2, None)
+        self.assertEqual(table.lookup(5)[1], 20)
+
+    def testSymmetry(self):
+        # Mirrored CrossFour positions
+        game, mirror = CrossFour.Game(4, 4), CrossFour.Game(4, 4)
+        for move in [0, 1, 1]:
+            game.play(move)
+            mirror.play(3 - move)
+        self.assertNotEqual(game.hash, mirror.hash)
+        self.assertEqual(game.canonical()[0], mirror.canonical()[0])
+        self.assertEqual(len(game.unique_moves(game.possible_moves())), 4)
+        self.assertEqual(len(CrossFour.Game(4, 4).unique_moves(CrossFour.Game(4, 4).possible_moves())), 2)
+        # The 4 rotations of a TicTacToe position
+        keys = set()
+        for x, y in [(0, 1), (1, 0), (2, 1), (1, 2)]:
+            game = TicTacToe.Game()
+            game.play((x, y))
+            keys.add(game.canonical()[0])
+        self.assertEqual(len(keys), 1)
+        game = TicTacToe.Game()
+        self.assertEqual(len(game.unique_moves(game.possible_moves())), 3)
+        # A symmetric table maps the moves back
+        table = Minimax.TranspositionTable(2**10, symmetric=True)
+        game.play((0, 0))
+        table.store_position(game, 5, Minimax.EXACT, 1, TicTacToe.Move((0, 1), 2))
+        game.revert()
+        game.play((2, 2))
+        # (either way, as the position is symmetric)
+        self.assertTrue(table.lookup_position(game)[4].position in [(2, 1), (1, 2)])
+        # Same values, fewer nodes
+        game = TicTacToe.Game()
+        value, move, strokes = Minimax.minimax(game, TicTacToe.Player(1),
+                                               table=Minimax.TranspositionTable(2**10))
+        svalue, smove, sstrokes = Minimax.minimax(game, TicTacToe.Player(1),
+                                                  table=Minimax.TranspositionTable(2**10,
+                                                                                   symmetric=True))
+        self.assertEqual(value, svalue)
+        self.assertTrue(sstrokes < strokes)
+
+
+class GeneticTest(unittest.TestCase):
+
+    def testToughWorld(self):
+        random.seed(0)
+        statistics = []
+        evaluated = []
+        def eval_fn(population):
+            evaluated.extend(population)
+            return [sum(player.genome) for player in population]
+        scored = Genetic.tough_world(CrossFour.AdvancedPlayer, 10, eval_fn, size=20,
+                                     mutation=0.1, statistics=statistics, verbose=False,
+                                     reuse_elite_fitness=True)
+        self.assertEqual(len(scored), 20)
+        self.assertEqual(len(statistics), 11)
+        self.assertEqual(len(evaluated), 20 + 10*18)
+        bests = [stats['best'] for stats in statistics]
+        self.assertEqual(bests, sorted(bests))
+        self.assertTrue(bests[-1] > bests[0])
+        self.assertEqual(scored[0][0], sum(scored[0][1].genome))
+        # By default, the whole population is evaluated at each generation
+        del evaluated[:]
+        Genetic.tough_world(CrossFour.AdvancedPlayer, 3, eval_fn, size=20, verbose=False)
+        self.assertEqual(len(evaluated), 20*4)
+
+    def testResume(self):
+        eval_fn = lambda population: [sum(player.genome) for player in population]
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'run.ckpt')
+        try:
+            random.seed(0)
+            full = Genetic.tough_world(CrossFour.AdvancedPlayer, 6, eval_fn, size=10,
+                                       mutation=0.1, verbose=False)
+            # Interrupted after 3 generations, and resumed
+            random.seed(0)
+            Genetic.tough_world(CrossFour.AdvancedPlayer, 3, eval_fn, size=10,
+                                mutation=0.1, verbose=False, checkpoint=checkpoint)
+            self.assertEqual(Genetic.load_checkpoint(checkpoint)['generation'], 3)
+            random.seed(1)
+            resumed = Genetic.resume(checkpoint, eval_fn, 6, verbose=False)
+            self.assertEqual([(s, p.genome) for s, p in full],
+                             [(s, p.genome) for s, p in resumed])
+            self.assertEqual(Genetic.load_checkpoint(checkpoint)['generation'], 6)
+        finally:
+            os.remove(checkpoint)
+            os.rmdir(os.path.dirname(checkpoint))
+
+    def testRankSelection(self):
+        random.seed(0)
+        scored = [(3, 'a'), (2, 'b'), (1, 'c')]
+        picks = [Genetic.rank_selection(scored) for i in range(600)]
+        self.assertTrue(picks.count('a') > picks.count('b') > picks.count('c'))
+
+
+
+class TournamentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.genomes = [[50, 10, 40, 60, 5, 30],
+                        [10, 90, 20, 80, 30, 70],
+                        [99, 0, 99, 0, 99, 0],
+                        [0, 99, 0, 99, 0, 99]]
+
+    def testRoundRobin(self):
+        scores = Tournament.round_robin(self.genomes, max_workers=1,
+                                        columns=5, rows=5, depth=2)
+        self.assertEqual(len(scores), 4)
+        self.assertEqual(sum(scores), 0)
+        self.assertEqual(scores, Tournament.round_robin(self.genomes, max_workers=2,
+                                                        columns=5, rows=5, depth=2))
+        # Statistics of the tournament, whatever the number of workers
+        stats, pooled = Minimax.SearchStats(), Minimax.SearchStats()
+        Tournament.round_robin(self.genomes, max_workers=1, columns=5, rows=5, depth=2,
+                               stats=stats)
+        Tournament.round_robin(self.genomes, max_workers=2, columns=5, rows=5, depth=2,
+                               stats=pooled)
+        self.assertEqual(stats.searches, pooled.searches)
+        self.assertEqual(stats.nodes, pooled.nodes)
+        self.assertTrue(stats.nodes > stats.searches > 12)
+
+    def testMatchCache(self):
+        cache = Tournament.MatchCache()
+        scores = Tournament.round_robin(self.genomes, max_workers=1, columns=5, rows=5,
+                                        depth=1, cache=cache)
+        self.assertEqual(cache.misses, 6)
+        # Swapped pairings are found too
+        reverse = Tournament.round_robin(self.genomes[::-1], max_workers=1, columns=5,
+                                         rows=5, depth=1, cache=cache)
+        self.assertEqual(cache.hits, 6)
+        self.assertEqual(scores, reverse[::-1])
+        filename = os.path.join(tempfile.mkdtemp(), 'cache')
+        cache = Tournament.MatchCache(filename)
+        cache.put([1], [2], 5, 5, 1, 2)
+        cache.close()
+        cache = Tournament.MatchCache(filename)
+        self.assertEqual(cache.get([2], [1], 5, 5, 1), -2)
+        cache.close()
+
+    def testSchedulers(self):
+        genomes = self.genomes * 2
+        for name, scheduler in Tournament.SCHEDULERS.items():
+            scores = scheduler(genomes, max_workers=1, columns=5, rows=5, depth=1)
+            self.assertEqual(len(scores), len(genomes), name)
+            # Clones score the same when the opponents do not depend on chance
+            if name in ['round_robin', 'benchmark_panel']:
+                self.assertEqual(scores[:4], scores[4:], name)
+
+
+
+
+class BatchTest(unittest.TestCase):
+
+    def testRandomGames(self):
+        # The batch agrees with the game engine on the same moves
+        rand = Batch.np.random.RandomState(0)
+        games = Batch.Games(100, 6, 5)
+        columns = []
+        while (games.status == -1).any():
+            columns.append(games.random_moves(rand))
+            games.play(columns[-1])
+        for i in xrange(100):
+            game = CrossFour.Game(6, 5)
+            for c in columns:
+                if game.status != -1:
+                    break
+                game.play(int(c[i]))
+            self.assertEqual(game.status, games.status[i])
+            self.assertEqual(len(game.history), games.plies[i])
+
+    def testLoad(self):
+        game = CrossFour.Game(5, 5, bitboard=True)
+        for move in [0, 1, 0, 1, 0]:
+            game.play(move)
+        # Player 2 must block column 0, else player 1 wins
+        games = Batch.Games.load(game, 10)
+        self.assertEqual(list(games.heights[3]), [3, 2, 0, 0, 0])
+        self.assertEqual(list(games.colors), [2]*10)
+        games.play([1]*10)
+        games.play([0]*10)
+        self.assertEqual(list(games.status), [1]*10)
+        # A policy always playing the leftmost column
+        games = Batch.Games.load(game, 10)
+        status = games.playout(policy=lambda games: games.legal().argmax(axis=1))
+        self.assertEqual(list(status), [2]*10)
+        draws, wins1, wins2 = Batch.random_playouts(game, 50, seed=0)
+        self.assertEqual(draws + wins1 + wins2, 50)
+
+    def testFeatures(self):
+        # Positions of random games, some of them finished
+        random.seed(0)
+        games = Batch.Games(40, 6, 5)
+        positions = []
+        for i in xrange(40):
+            game = CrossFour.Game(6, 5)
+            for ply in xrange(i):
+                if game.status == -1:
+                    game.play(random.choice(game.possible_moves()))
+            positions.append(game)
+        for i, game in enumerate(positions):
+            loaded = Batch.Games.load(game, 1)
+            for name in ['boards', 'heights', 'colors', 'status', 'plies']:
+                getattr(games, name)[i] = getattr(loaded, name)[0]
+        genomes = [[random.randint(0, 99) for i in xrange(6)] for j in xrange(7)]
+        for color in [1, 2]:
+            features, outcomes = CrossFour.feature_matrix(positions, color)
+            scores = CrossFour.evaluate_batch(features, outcomes, genomes)
+            self.assertEqual(scores.shape, (40, 7))
+            for i, game in enumerate(positions):
+                for j, genome in enumerate(genomes):
+                    self.assertEqual(scores[i, j], CrossFour.AdvancedPlayer(genome, color).eval(game))
+            batch_features, batch_outcomes = games.features(color)
+            self.assertEqual(batch_features.tolist(), features.tolist())
+            self.assertEqual(batch_outcomes.tolist(), outcomes.tolist())
+
+
+
+
+class MCTSTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.game = CrossFour.Game(5, 5)
+        for move in [0, 1, 0, 1, 0, 4]:
+            self.game.play(move)
+
+    def testWinAndBlock(self):
+        player = MCTS.MCTS_Player(1)
+        player.iterations = 300
+        self.assertEqual(player.play(self.game), 1)
+        self.game.revert()
+        self.game.revert()
+        # Player 2 blocks column 0
+        player = MCTS.MCTS_Player(2)
+        player.iterations = 300
+        player.batch = 8
+        player.play(self.game)
+        self.assertEqual(self.game.history[-1].column, 0)
+        self.assertEqual(player.playouts, 300*8)
+
+    def testTreeReuse(self):
+        game = CrossFour.Game(5, 5)
+        player = MCTS.MCTS_Player(1)
+        player.iterations = 200
+        player.play(game)
+        game.play(3)
+        root = player.search(game)
+        self.assertEqual(root.move, game.history[-1])
+        self.assertTrue(root.visits > 200)
+        # Another game: a new tree
+        root = player.search(self.game)
+        self.assertEqual(root.visits, 200)
+
+    def testParallel(self):
+        player = MCTS.MCTS_Player(1)
+        player.iterations = 100
+        player.processes = 2
+        try:
+            root = player.search_processes(self.game)
+        finally:
+            MCTS.close()
+        self.assertEqual(player.playouts, 200)
+        self.assertEqual(sum([child.visits for child in root.children]), 200)
+        self.assertEqual(max(root.children, key=lambda child: child.visits).move.column, 0)
+        # As many trees as CPUs
+        player.processes = 0
+        try:
+            player.search_processes(self.game)
+        finally:
+            MCTS.close()
+        self.assertEqual(player.playouts, 100*multiprocessing.cpu_count())
+        player = MCTS.MCTS_Player(1)
+        player.iterations = 200
+        player.threads = 4
+        player.virtual_loss = 0
+        self.assertRaises(RuntimeError, player.search_threads, self.game)
+        player.virtual_loss = 1
+        root = player.search_threads(self.game)
+        self.assertEqual(player.playouts, 200)
+        # Virtual losses are all given back
+        self.assertEqual(root.visits, 200)
+        self.assertEqual(sum([child.visits for child in root.children]), 200)
+        self.assertEqual(player.play(self.game), 1)
+
+
+
+
+class TablebaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def testTicTacToe(self):
+        filename = os.path.join(self.directory, 'tictactoe.tb')
+        self.assertEqual(Tablebase.build(TicTacToe.Game(), filename), 627)
+        tablebase = Tablebase.Tablebase(filename)
+        self.assertEqual(tablebase.lookup(TicTacToe.Game())[0], 0)
+        # Perfect players draw, and never lose against a random one
+        def run(players):
+            game = TicTacToe.Game()
+            while game.status == -1:
+                players[len(game.history) % 2].play(game)
+            return game.status
+        perfect = Tablebase.Tablebase_Player(tablebase)
+        self.assertEqual(run([perfect, perfect]), 0)
+        random.seed(0)
+        for i in xrange(5):
+            self.assertNotEqual(run([perfect, Generic.Random_Player()]), 2)
+            self.assertNotEqual(run([Generic.Random_Player(), perfect]), 1)
+
+    def testCrossThree(self):
+        filename = os.path.join(self.directory, 'crossthree.tb')
+        Tablebase.build(CrossThree.Game(), filename)
+        tablebase = Tablebase.Tablebase(filename)
+        # The first player wins in 9 plies
+        game = CrossThree.Game()
+        self.assertEqual(tablebase.lookup(game)[0], Tablebase.WIN - 9)
+        # Along a game, values follow from the values of the best moves
+        random.seed(1)
+        while game.status == -1:
+            value, move = tablebase.lookup(game)
+            if game.play(move) == -1:
+                self.assertEqual(value, Tablebase._backup(tablebase.lookup(game)[0]))
+                game.revert()
+                game.play(random.choice(game.possible_moves()))
+        self.assertRaises(RuntimeError, tablebase.lookup, CrossFour.Game(4, 4))
+
+
+
+
+class DatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'positions.db')
+
+    def tearDown(self):
+        os.remove(self.filename)
+        os.rmdir(self.directory)
+
+    def testEndgames(self):
+        # A position with 12 empty cells, and the endgames below it
+        game = CrossFour.Game(6, 5)
+        for move in [2, 3, 3, 2, 0, 5, 1, 4, 1, 0, 5, 4, 4, 1, 5, 0, 2, 3]:
+            game.play(move)
+        records = Database.endgame_records(game, 50, 8, seed=0)
+        self.assertEqual(len(game.history), 18)
+        Database.build(game, self.filename, records)
+        database = cPickle.loads(cPickle.dumps(Database.Database(self.filename)))
+        self.assertEqual(len(database), len(records))
+        player = CrossFour.Player(game.currentColor)
+        value, move, strokes = Minimax.minimax(game, player)
+        dbvalue, dbmove, dbstrokes = Minimax.minimax(game, player, database=database)
+        self.assertEqual(value, dbvalue)
+        self.assertTrue(dbstrokes < strokes)
+        self.assertTrue(database.hits > 0)
+
+    def testOpenings(self):
+        game = CrossFour.Game(6, 5)
+        player = CrossFour.AdvancedPlayer([50, 10, 40, 60, 5, 30])
+        player.max_depth = 2
+        Database.build(game, self.filename, Database.opening_records(game, 2, player))
+        database = Database.Database(self.filename)
+        # The empty board and one of each pair of symmetric answers
+        self.assertEqual(len(database), 1 + 3)
+        player.color = 1
+        value, move, strokes = Minimax.minimax(game, player)
+        self.assertEqual(database.lookup(game), (None, move))
+        game.play(5)
+        self.assertNotEqual(database.lookup(game), None)
+        self.assertRaises(RuntimeError, database.lookup, CrossFour.Game(5, 5))
+        # A table shared by the searches does not change the records
+        game = CrossFour.Game(5, 4)
+        game.play(2); game.play(1)
+        player = CrossFour.AdvancedPlayer([50, 10, 40, 60, 5, 30])
+        player.max_depth = 4
+        for engine in ['minimax', 'negamax']:
+            records = Database.opening_records(game, 3, player, engine)
+            table = Minimax.TranspositionTable(2**14)
+            self.assertEqual(Database.opening_records(game, 3, player, engine, table), records)
+            self.assertEqual(Book.search_book(game, 3, player, engine, table), records)
+        self.assertEqual(len(game.history), 2)
+
+
+
+
+class BookTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'openings.book')
+
+    def tearDown(self):
+        os.remove(self.filename)
+        os.rmdir(self.directory)
+
+    def testSearchBook(self):
+        game = CrossFour.Game(5, 5)
+        player = CrossFour.AdvancedPlayer([50, 10, 40, 60, 5, 30])
+        player.max_depth = 2
+        Book.save(game, self.filename, Book.search_book(game, 3, player))
+        # Book moves are played without searching
+        player.book = Book.Book(self.filename)
+        player.book_plies = 2
+        player.stats = Minimax.SearchStats()
+        player.color = 1
+        player.play(game)
+        self.assertEqual(player.stats.nodes, 0)
+        # Searched after book_plies
+        game.play(4)
+        player.play(game)
+        self.assertTrue(player.stats.nodes > 0)
+
+    def testSelfPlayBook(self):
+        games = [([1, 0, 1, 0, 1, 0, 1], 1),
+                 ([3, 0, 3, 0, 3, 0, 4, 0], 2)]
+        self.assertEqual(Book.selfplay_book(games, 5, 5, plies=2, min_games=2), {})
+        Book.save(CrossFour.Game(5, 5), self.filename,
+                  Book.selfplay_book(games, 5, 5, plies=2, min_games=1))
+        book = Book.Book(self.filename)
+        game = CrossFour.Game(5, 5)
+        self.assertEqual(book.move(game).column, 1)
+        game.play(3)
+        self.assertEqual(book.move(game).column, 0)
+        game.play(2)
+        self.assertEqual(book.move(game), None)
+        random.seed(0)
+        games = Book.selfplay_games(Generic.Random_Player(), Generic.Random_Player(), 3, 5, 5)
+        self.assertEqual(len(games), 3)
+        self.assertTrue(all([status in [0, 1, 2] for moves, status in games]))
+
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def testPerft(self):
+        # No game ends before 7 plies: all the sequences count
+        self.assertEqual(benchmark.perft(CrossFour.Game(7, 6), 4), 7**4)
+        self.assertEqual(benchmark.perft(TicTacToe.Game(), 3), 9*8*7)
+        # Games ended count once: 0 wins, 1 fills its column
+        g = CrossFour.Game(4, 4)
+        for column in [0, 1, 0, 1, 0, 1]:
+            g.play(column)
+        self.assertEqual(benchmark.perft(g, 1), 4)
+        self.assertEqual(benchmark.perft(g, 2), 1 + 3 + 4 + 4)
+
+    def testSuite(self):
+        report = benchmark.run(['perft', 'solve', 'tournament'], quick=True)
+        report = json.loads(json.dumps(report))
+        self.assertEqual(sorted(report['benchmarks']), ['perft', 'solve', 'tournament'])
+        self.assertEqual(report['benchmarks']['perft'][0]['positions'], 5**4)
+        self.assertEqual(report['benchmarks']['solve'][0]['game'], 'TicTacToe')
+        # A draw after the 9 moves
+        self.assertEqual(report['benchmarks']['solve'][0]['value'], 9)
+        self.assertEqual(report['benchmarks']['tournament'][0]['games'], 2)
+
 
 if __name__ == '__main__':
     unittest.main()